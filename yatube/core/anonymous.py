@@ -0,0 +1,64 @@
+"""Анонимное чтение без сессий и кук.
+
+GET к страницам из COOKIELESS_VIEWS от клиента без куки сессии и
+сообщений обслуживается как заведомо анонимный: request.user -
+AnonymousUser, request.session - пустая сессия, чтение которой не
+помечает её использованной. Поэтому в ответе нет Set-Cookie и
+Vary: Cookie, а Cache-Control разрешает общему кэшу хранить страницу
+COOKIELESS_PROXY_MAX_AGE секунд. Браузер всё равно перепроверяет её
+по ETag: после входа пользователь не увидит анонимную копию.
+Ответ, который всё же ставит куку, публичным не помечается.
+
+Обратный прокси должен ходить мимо кэша для запросов с кукой сессии.
+"""
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_cache_control
+
+SAFE_METHODS = ('GET', 'HEAD')
+CACHEABLE_STATUSES = (200, 304)
+
+
+class CookielessSession(SessionBase):
+    """Всегда пустая сессия без обращений к хранилищу."""
+
+    @property
+    def _session(self):
+        return {}
+
+    def __setitem__(self, key, value):
+        raise RuntimeError('Страницы без кук не пишут в сессию')
+
+
+class CookielessReadMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'COOKIELESS_ANONYMOUS', False):
+            raise MiddlewareNotUsed
+        self.views = set(settings.COOKIELESS_VIEWS)
+        self.cookies = (settings.SESSION_COOKIE_NAME,
+                        CookieStorage.cookie_name)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # Ответ с Set-Cookie (например, csrftoken от debug_toolbar)
+        # общему кэшу отдавать нельзя: кука достанется всем
+        if (getattr(request, 'cookieless', False)
+                and response.status_code in CACHEABLE_STATUSES
+                and not response.cookies):
+            patch_cache_control(
+                response, public=True, max_age=0,
+                s_maxage=settings.COOKIELESS_PROXY_MAX_AGE)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in SAFE_METHODS
+                and request.resolver_match.view_name in self.views
+                and not any(name in request.COOKIES
+                            for name in self.cookies)):
+            request.session = CookielessSession()
+            request.user = AnonymousUser()
+            request.cookieless = True
@@ -0,0 +1,203 @@
+"""Общий для всех процессов кэш в файле SQLite.
+
+LocMemCache живёт в памяти одного воркера: у каждого процесса свой
+холодный кэш, а инвалидация в одном не видна остальным. Этот бэкенд
+хранит записи в одном файле SQLite (WAL), поэтому его делят все
+воркеры на хосте без отдельного сервера.
+
+Настройки OPTIONS:
+    MAX_ENTRIES     - предел записей, сверх него вытесняются давно
+                      не читанные (LRU);
+    CULL_FREQUENCY  - при вытеснении удаляется 1/CULL_FREQUENCY записей;
+    CULL_EVERY      - как часто (раз в N записей) проверять предел;
+    LRU_RESOLUTION  - не чаще раза в столько секунд обновлять время
+                      последнего чтения записи;
+    TIMEOUT         - таймаут ожидания блокировки файла, сек.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _dump(value):
+    # Целые храним как INTEGER, чтобы incr был одним UPDATE
+    if type(value) is int:
+        return value
+    return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._busy_timeout = float(options.get('TIMEOUT', 5))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection, local.pid = connection, pid
+        return local.connection
+
+    def _expires(self, timeout):
+        # Django уже возвращает момент истечения, а не длительность
+        return self.get_backend_timeout(timeout)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db
+        with _immediate(db):
+            db.execute(f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}',
+                       (key, now))
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)',
+                (key, _dump(value), self._expires(timeout), now))
+        self._after_write()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {ALIVE}',
+            (key, now)).fetchone()
+        if row is None:
+            return default
+        if now - row[1] > self._lru_resolution:
+            self._db.execute('UPDATE cache SET accessed = ? WHERE key = ?',
+                             (now, key))
+        return _load(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+            (key, _dump(value), self._expires(timeout), time.time()))
+        self._after_write()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self._expires(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарный инкремент одним UPDATE под блокировкой записи."""
+        key = self._key(key, version)
+        db = self._db
+        with _immediate(db):
+            db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? AND '
+                f"typeof(value) = 'integer' AND {ALIVE}",
+                (delta, key, time.time()))
+            row = db.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                (key, time.time())).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        if not isinstance(row[0], int):
+            raise TypeError(f"Value of '{key}' is not an integer")
+        return row[0]
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def clear_expired(self):
+        """Удаляет просроченные записи, возвращает их число."""
+        cursor = self._db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def cull(self):
+        """Чистит просроченное и вытесняет давно не читанные записи."""
+        removed = self.clear_expired()
+        db = self._db
+        total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return removed
+        excess = total - self._max_entries
+        if self._cull_frequency:
+            excess = max(excess, total // self._cull_frequency)
+        cursor = db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,))
+        return removed + cursor.rowcount
+
+    def _after_write(self):
+        self._writes += 1
+        if self._writes % self._cull_every == 0:
+            self.cull()
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами, как и у LocMemCache
+        pass
+
+
+class _immediate:
+    """BEGIN IMMEDIATE ... COMMIT: блокировка записи на весь блок."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
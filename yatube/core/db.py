@@ -0,0 +1,25 @@
+"""Настройка соединений SQLite при открытии.
+
+WAL разводит читателей и писателя: чтение не ждёт, пока идёт запись
+комментария или поста. Остальные PRAGMA действуют на соединение, а не
+на файл, поэтому ставятся на каждое новое соединение; при CONN_MAX_AGE
+соединение живёт между запросами и это происходит редко.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
@@ -0,0 +1,53 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+PAYLOAD = {'text': 'Тестовый пост ' * 50, 'ids': list(range(50))}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержки get/set кэша SQLite и LocMemCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+
+    def measure(self, func, operations, keys):
+        timings = []
+        for i in range(operations):
+            key = f'bench:{i % keys}'
+            start = time.perf_counter()
+            func(key)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return (statistics.mean(timings) * 1e6,
+                timings[int(len(timings) * 0.99) - 1] * 1e6)
+
+    def handle(self, *args, **options):
+        operations, keys = options['operations'], options['keys']
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('bench', {}),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), {}),
+            }
+            for name, cache in backends.items():
+                cache._max_entries = keys * 2
+                cache.set('bench:version', 0, None)
+                set_mean, set_p99 = self.measure(
+                    lambda key: cache.set(key, PAYLOAD), operations, keys)
+                get_mean, get_p99 = self.measure(
+                    cache.get, operations, keys)
+                incr_mean, incr_p99 = self.measure(
+                    lambda key: cache.incr('bench:version'), operations, 1)
+                self.stdout.write(
+                    f'{name:>7}: set {set_mean:8.1f} мкс (p99 {set_p99:.1f})'
+                    f' | get {get_mean:8.1f} мкс (p99 {get_p99:.1f})'
+                    f' | incr {incr_mean:8.1f} мкс (p99 {incr_p99:.1f})'
+                )
@@ -0,0 +1,107 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_author_date ON post (author_id, pub_date)',
+)
+READ_SQL = ('SELECT id, text FROM post WHERE author_id = ? '
+            'ORDER BY pub_date DESC LIMIT 10')
+WRITE_SQL = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+TEXT = 'Тестовый пост ' * 20
+AUTHORS = 500
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает смешанную нагрузку чтение/запись на SQLite: '
+            'настройки по умолчанию и SQLITE_PRAGMAS с постоянным '
+            'соединением')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--write-share', type=float, default=0.1,
+                            help='Доля операций записи')
+        parser.add_argument('--rows', type=int, default=50000)
+
+    def prepare(self, path, rows):
+        db = sqlite3.connect(path)
+        for statement in SCHEMA:
+            db.execute(statement)
+        rng = random.Random(0)
+        db.executemany(WRITE_SQL, (
+            (rng.randrange(AUTHORS), TEXT, rng.random() * 1e9)
+            for _ in range(rows)))
+        db.commit()
+        db.close()
+
+    def connect(self, path, tuned):
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        if tuned:
+            apply_pragmas(db.cursor(), settings.SQLITE_PRAGMAS)
+        return db
+
+    def worker(self, path, tuned, deadline, write_share, seed, totals):
+        rng = random.Random(seed)
+        counts = {'read': 0, 'write': 0, 'locked': 0}
+        # Как Django без CONN_MAX_AGE: соединение на каждый «запрос»
+        db = self.connect(path, tuned) if tuned else None
+        while time.monotonic() < deadline:
+            connection = db or self.connect(path, tuned)
+            try:
+                if rng.random() < write_share:
+                    with connection:
+                        connection.execute(WRITE_SQL, (
+                            rng.randrange(AUTHORS), TEXT, time.time()))
+                    counts['write'] += 1
+                else:
+                    connection.execute(
+                        READ_SQL, (rng.randrange(AUTHORS),)).fetchall()
+                    counts['read'] += 1
+            except sqlite3.OperationalError:
+                counts['locked'] += 1
+            finally:
+                if db is None:
+                    connection.close()
+        if db is not None:
+            db.close()
+        totals.append(counts)
+
+    def run(self, path, tuned, options):
+        totals = []
+        deadline = time.monotonic() + options['seconds']
+        threads = [
+            threading.Thread(target=self.worker, args=(
+                path, tuned, deadline, options['write_share'], number,
+                totals))
+            for number in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {key: sum(counts[key] for counts in totals)
+                for key in ('read', 'write', 'locked')}
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        with tempfile.TemporaryDirectory() as directory:
+            for name, tuned in (('default', False), ('tuned', True)):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self.prepare(path, options['rows'])
+                result = self.run(path, tuned, options)
+                self.stdout.write(
+                    f'{name:>8}: чтений {result["read"] / seconds:8.0f}/с'
+                    f' | записей {result["write"] / seconds:7.0f}/с'
+                    f' | database is locked: {result["locked"]}'
+                )
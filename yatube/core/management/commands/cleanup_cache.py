@@ -0,0 +1,19 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные записи и вытесняет лишние из кэша SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not isinstance(cache, SQLiteCache):
+            raise CommandError(
+                f"Кэш '{options['alias']}' не использует SQLiteCache")
+        removed = cache.cull()
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {removed}'))
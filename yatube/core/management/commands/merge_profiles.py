@@ -0,0 +1,39 @@
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import collapse, write_collapsed
+
+
+class Command(BaseCommand):
+    help = ('Сводит дампы cProfile в collapsed stacks для flame graph '
+            '(flamegraph.pl, speedscope)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Файлы .prof или каталоги с ними')
+        parser.add_argument('--view', default='',
+                            help='Только дампы этого имени URL, '
+                                 'например posts:profile')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        prefix = options['view'].replace(':', '.')
+        files = []
+        for path in options['paths'] or [settings.PROFILING_DIR]:
+            if os.path.isdir(path):
+                files += sorted(glob.glob(
+                    os.path.join(path, f'{prefix}*.prof')))
+            else:
+                files.append(path)
+        if not files:
+            raise CommandError('Дампы профиля не найдены')
+        stacks = collapse(files)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                write_collapsed(stacks, output)
+        else:
+            write_collapsed(stacks, self.stdout)
+        self.stderr.write(f'Сведено дампов: {len(files)}')
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = ('Сводит журнал медленных SQL по отпечаткам: худшие по '
+            'суммарному времени')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.SLOW_QUERY_LOG_PATH)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--plans', action='store_true',
+                            help='Показать план самого долгого запроса')
+
+    def handle(self, *args, **options):
+        groups = aggregate(read_log(options['path'],
+                                    settings.SLOW_QUERY_LOG_BACKUPS))
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+        for group in groups[:options['top']]:
+            self.stdout.write(self.style.WARNING(
+                f"{group['hash']}  всего {group['total_ms']:.0f} мс, "
+                f"{group['count']} раз, максимум {group['max_ms']:.0f} мс, "
+                f"в среднем {group['total_ms'] / group['count']:.1f} мс"))
+            self.stdout.write(f"  {', '.join(sorted(group['views']))}")
+            self.stdout.write(f"  {group['fingerprint']}")
+            if options['plans'] and group['plan']:
+                for step in group['plan']:
+                    self.stdout.write(f'    {step}')
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.replica import sync
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную БД в реплику через backup API SQLite; '
+            'с --loop повторяет каждые REPLICA_SYNC_INTERVAL секунд')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            sync()
+            took = time.monotonic() - started
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Реплика обновлена за {took:.2f} с'))
+                return
+            time.sleep(max(0, settings.REPLICA_SYNC_INTERVAL - took))
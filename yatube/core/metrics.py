@@ -0,0 +1,229 @@
+"""Метрики в текстовом формате Prometheus, общие для всех воркеров.
+
+На горячем пути значение только прибавляется к словарю в памяти
+процесса. Раз в METRICS_FLUSH_INTERVAL секунд накопленное сливается
+одной транзакцией в файл SQLite (METRICS_PATH), где суммируются
+данные всех процессов хоста. /metrics/ сливает своё и читает сумму.
+
+Гистограммы хранятся по отдельным корзинам (колонка le, не
+накопительно), накопительные значения считаются при выдаче.
+"""
+import atexit
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+THUMBNAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+WRITE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+# Слив идёт на пути запроса: занятый файл ждём недолго, накопленное
+# сольётся в следующий раз
+FLUSH_TIMEOUT = 0.5
+
+# Имя -> (тип, описание, корзины гистограммы)
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Запросы по имени URL, методу и статусу', None),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по имени URL', LATENCY_BUCKETS),
+    'yatube_request_queries': (
+        'histogram', 'SQL-запросов на один ответ по имени URL (выборка)',
+        QUERY_BUCKETS),
+    'yatube_cache_reads_total': (
+        'counter', 'Чтения кэша Django: попадания и промахи', None),
+    'yatube_thumbnail_seconds': (
+        'histogram', 'Время генерации миниатюры поста', THUMBNAIL_BUCKETS),
+    'yatube_thumbnail_failures_total': (
+        'counter', 'Миниатюры, которые не удалось сделать', None),
+    'yatube_write_queue_depth': (
+        'histogram', 'Заданий в очереди записи на момент сбора пачки',
+        WRITE_BUCKETS),
+    'yatube_write_batch_size': (
+        'histogram', 'Заданий записи в одном коммите', WRITE_BUCKETS),
+    'yatube_write_failures_total': (
+        'counter', 'Задания записи, потерянные из-за ошибки коммита', None),
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    ' name TEXT NOT NULL,'
+    ' labels TEXT NOT NULL,'
+    ' le TEXT NOT NULL,'
+    ' value REAL NOT NULL,'
+    ' PRIMARY KEY (name, labels, le)'
+    ') WITHOUT ROWID'
+)
+UPSERT = (
+    'INSERT INTO metrics VALUES (?, ?, ?, ?) ON CONFLICT (name, labels, le) '
+    'DO UPDATE SET value = value + excluded.value'
+)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def format_labels(labels):
+    return ','.join(f'{key}="{_escape(value)}"'
+                    for key, value in sorted(labels.items()))
+
+
+def _le(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class Registry:
+    def __init__(self):
+        self._pending = defaultdict(float)
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'METRICS', False)
+
+    @property
+    def _db(self):
+        # Соединение своё у потока и у процесса после fork
+        local = self._local
+        owner = (os.getpid(), settings.METRICS_PATH)
+        if getattr(local, 'owner', None) != owner:
+            connection = sqlite3.connect(
+                settings.METRICS_PATH, timeout=FLUSH_TIMEOUT,
+                isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+            local.connection, local.owner = connection, owner
+        return local.connection
+
+    def _maybe_flush(self):
+        if (time.monotonic() - self._flushed
+                > settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[(name, format_labels(labels), '')] += amount
+        self._maybe_flush()
+
+    def observe(self, name, value, **labels):
+        """Наблюдение гистограммы: корзина, сумма и счётчик."""
+        if not self.enabled:
+            return
+        buckets = METRICS[name][2]
+        bound = next((bucket for bucket in buckets if value <= bucket),
+                     math.inf)
+        labels = format_labels(labels)
+        with self._lock:
+            self._pending[(f'{name}_bucket', labels, _le(bound))] += 1
+            self._pending[(f'{name}_sum', labels, '')] += value
+            self._pending[(f'{name}_count', labels, '')] += 1
+        self._maybe_flush()
+
+    def flush(self):
+        """Сливает накопленное процессом в общий файл."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.executemany(UPSERT, [key + (value,)
+                                        for key, value in pending.items()])
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            # Метрики не должны ронять запрос: накопленное вернётся
+            # в очередь и сольётся в следующий раз
+            logger.exception('Не удалось слить метрики в %s',
+                             settings.METRICS_PATH)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    def collect(self):
+        self.flush()
+        return self._db.execute(
+            'SELECT name, labels, le, value FROM metrics '
+            'ORDER BY name, labels'
+        ).fetchall()
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        self._db.execute('DELETE FROM metrics')
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        series = defaultdict(list)
+        for name, labels, le, value in self.collect():
+            series[name].append((labels, le, value))
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                lines.extend(_histogram(name, buckets, series))
+            else:
+                lines.extend(_sample(name, labels, value)
+                             for labels, _, value in series[name])
+        lines.extend(_hit_ratio(series['yatube_cache_reads_total']))
+        return '\n'.join(lines) + '\n'
+
+
+def _sample(name, labels, value):
+    value = int(value) if float(value).is_integer() else value
+    return f'{name}{{{labels}}} {value}' if labels else f'{name} {value}'
+
+
+def _histogram(name, buckets, series):
+    """Накопительные корзины le, _sum и _count по каждому набору меток."""
+    counts = defaultdict(dict)
+    for labels, le, value in series[f'{name}_bucket']:
+        counts[labels][le] = value
+    lines = []
+    for labels, bucket_counts in sorted(counts.items()):
+        total = 0
+        for le in [_le(bucket) for bucket in buckets] + ['+Inf']:
+            total += bucket_counts.get(le, 0)
+            bucket_labels = ','.join(filter(None, [labels, f'le="{le}"']))
+            lines.append(_sample(f'{name}_bucket', bucket_labels, total))
+    for suffix in ('_sum', '_count'):
+        lines.extend(_sample(f'{name}{suffix}', labels, value)
+                     for labels, _, value in series[f'{name}{suffix}'])
+    return lines
+
+
+def _hit_ratio(reads):
+    results = {labels: value for labels, _, value in reads}
+    hits = results.get('result="hit"', 0)
+    total = hits + results.get('result="miss"', 0)
+    if not total:
+        return []
+    return [
+        '# HELP yatube_cache_hit_ratio Доля попаданий в кэш Django',
+        '# TYPE yatube_cache_hit_ratio gauge',
+        f'yatube_cache_hit_ratio {hits / total:.4f}',
+    ]
+
+
+registry = Registry()
+atexit.register(lambda: registry.enabled and registry.flush())
@@ -0,0 +1,189 @@
+"""Профилирование отдельных запросов cProfile в бою.
+
+ProfilingMiddleware запускает view под cProfile для доли запросов
+PROFILING_SAMPLE_RATE или для запроса с заголовком X-Profile, равным
+PROFILING_TOKEN. Статистика сохраняется в PROFILING_DIR файлом
+<имя URL>-<время>.prof; команда merge_profiles сводит много таких
+файлов в collapsed stacks для flamegraph.pl или speedscope.
+"""
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# Ветви короче микросекунды и глубже MAX_DEPTH не разворачиваются
+MIN_SHARE = 1e-6
+MAX_DEPTH = 100
+
+
+def _authorized(request):
+    token = getattr(settings, 'PROFILING_TOKEN', '')
+    value = request.META.get(PROFILE_HEADER, '')
+    return bool(token) and hmac.compare_digest(value, token)
+
+
+def dump_name(request):
+    match = request.resolver_match
+    view = match.view_name if match else 'unmatched'
+    stamp = time.strftime('%Y%m%dT%H%M%S')
+    # Двоеточие из posts:index неудобно в именах файлов
+    return '{}-{}-{:06d}.prof'.format(view.replace(':', '.'), stamp,
+                                      int(time.time() * 1e6) % 10 ** 6)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING', False):
+            raise MiddlewareNotUsed
+        self.rate = settings.PROFILING_SAMPLE_RATE
+        self.directory = settings.PROFILING_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (_authorized(request) or random.random() < self.rate):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        profiler.dump_stats(os.path.join(self.directory,
+                                         dump_name(request)))
+        return response
+
+
+def _frame(function):
+    filename, line, name = function
+    if filename == '~':
+        # Встроенные функции: {method 'execute' of ...}
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def collapse(paths):
+    """Сводит дампы cProfile в collapsed stacks: {стек: микросекунды}.
+
+    cProfile хранит не стеки, а пары вызывающий -> вызываемый. Стеки
+    восстанавливаются проходом от корней по этим рёбрам, время
+    функции делится между её вызывающими пропорционально их доле во
+    времени вызовов - это приближение, достаточное для flame graph.
+
+    Взаимно рекурсивные функции (цепочка middleware Django, рендер
+    вложенных узлов шаблона) сворачиваются, как в gprof, в один кадр
+    цикла: иначе у цепочки нет корня и проход от корней её теряет.
+    """
+    stacks = defaultdict(float)
+    for path in paths:
+        stats = pstats.Stats(path).stats
+        callees = defaultdict(list)
+        for function, (_, _, _, _, callers) in stats.items():
+            for caller, caller_stats in callers.items():
+                callees[caller].append((function, caller_stats[3]))
+        graph = _condense(stats, callees)
+        for root in graph.roots:
+            _walk(graph, root, [graph.names[root]],
+                  graph.cumulative[root], stacks)
+    return stacks
+
+
+class _Graph:
+    """Граф вызовов, где каждый цикл - одна вершина."""
+
+    def __init__(self):
+        self.names = {}
+        self.cumulative = {}
+        self.edges = defaultdict(lambda: defaultdict(float))
+        self.roots = []
+
+
+def _condense(stats, callees):
+    component = _components(stats, callees)
+    members = defaultdict(list)
+    for function, number in component.items():
+        members[number].append(function)
+    graph = _Graph()
+    for number, functions in members.items():
+        # Вход в цикл - функция с наибольшим суммарным временем:
+        # cProfile не считает повторно рекурсивные вызовы
+        entry = max(functions, key=lambda function: stats[function][3])
+        name = _frame(entry)
+        graph.names[number] = (name if len(functions) == 1
+                               else f'{name} [цикл]')
+        graph.cumulative[number] = stats[entry][3]
+    called = set()
+    for caller, edges in callees.items():
+        for callee, edge_time in edges:
+            source, target = component[caller], component[callee]
+            if source != target:
+                graph.edges[source][target] += edge_time
+                called.add(target)
+    graph.roots = [number for number in members if number not in called]
+    return graph
+
+
+def _components(stats, callees):
+    """Компоненты сильной связности (Тарьян без рекурсии)."""
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    for start in stats:
+        if start in index:
+            continue
+        work = [(start, iter(callees[start]))]
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            function, edges = work[-1]
+            for callee, _ in edges:
+                if callee not in index:
+                    index[callee] = low[callee] = len(index)
+                    stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(callees[callee])))
+                    break
+                if callee in on_stack:
+                    low[function] = min(low[function], index[callee])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[function])
+                if low[function] == index[function]:
+                    _pop_component(function, index[function], stack,
+                                   on_stack, component)
+    return component
+
+
+def _pop_component(root, number, stack, on_stack, component):
+    while True:
+        member = stack.pop()
+        on_stack.discard(member)
+        component[member] = number
+        if member == root:
+            return
+
+
+def _walk(graph, node, stack, share, stacks):
+    """Раскладывает время share вершины на своё и на вызываемых."""
+    cumulative = graph.cumulative[node] or 1e-12
+    children = 0.0
+    for callee, edge_time in graph.edges[node].items():
+        part = share * edge_time / cumulative
+        if part < MIN_SHARE or len(stack) >= MAX_DEPTH:
+            continue
+        children += part
+        _walk(graph, callee, stack + [graph.names[callee]], part, stacks)
+    own = share - children
+    if own > 0:
+        stacks[';'.join(stack)] += own * 1e6
+
+
+def write_collapsed(stacks, stream):
+    for stack, micros in sorted(stacks.items()):
+        if micros >= 1:
+            stream.write(f'{stack} {int(micros)}\n')
@@ -0,0 +1,113 @@
+"""Чтение лент с реплики, запись - в основную БД.
+
+Реплика - второй файл SQLite, который команда sync_replica копирует
+из основного через backup API. Чтение с реплики разрешается по шагам:
+
+1. ReplicaMiddleware помечает запрос кандидатом, если это GET
+   к view из REPLICA_VIEWS и пользователь не закреплён за основной
+   БД после своей записи (кука на REPLICA_PIN_SECONDS);
+2. posts.conditional знает время последнего изменения областей
+   страницы и подтверждает чтение с реплики, только если реплика
+   скопирована позже (confirm_fresh);
+3. ReplicaRouter отдаёт 'replica' только подтверждённым запросам.
+
+Поэтому устаревшая реплика не попадёт ни в ответ, ни в кэш страниц.
+"""
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+PIN_COOKIE = 'primary_pin'
+SYNCED_KEY = 'core:replica:synced'
+SAFE_METHODS = ('GET', 'HEAD')
+
+CANDIDATE = 'candidate'
+CONFIRMED = 'confirmed'
+
+_local = threading.local()
+
+
+def replica_state():
+    return getattr(_local, 'state', None)
+
+
+def confirm_fresh(modified):
+    """Подтверждает чтение с реплики, если она свежее modified.
+
+    Время изменения ставится после коммита (page_cache.bump_versions),
+    поэтому копия, начатая позже, уже содержит это изменение.
+    """
+    if replica_state() != CANDIDATE:
+        return
+    synced = cache.get(SYNCED_KEY)
+    if synced is not None and synced > modified:
+        _local.state = CONFIRMED
+    else:
+        _local.state = None
+
+
+def sync(source=None, target=None):
+    """Копирует основную БД в реплику, возвращает время снимка."""
+    source = source or settings.DATABASES[PRIMARY]['NAME']
+    target = target or settings.DATABASES[REPLICA]['NAME']
+    # Снимок берётся на начало копирования: всё, что закоммичено
+    # раньше, в реплику попадёт
+    started = time.time()
+    primary = sqlite3.connect(source)
+    replica = sqlite3.connect(target, timeout=30)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+    cache.set(SYNCED_KEY, started, None)
+    return started
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replica_state() == CONFIRMED:
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия той же базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает в реплику вместе с данными
+        return db == PRIMARY
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = set(settings.REPLICA_VIEWS)
+
+    def __call__(self, request):
+        _local.state = None
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.state = None
+        if (request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            # Свою запись пользователь читает из основной БД
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in SAFE_METHODS
+                and request.resolver_match.view_name in self.views
+                and PIN_COOKIE not in request.COOKIES):
+            _local.state = CANDIDATE
@@ -0,0 +1,154 @@
+"""Журнал медленных SQL-запросов с планом выполнения.
+
+SlowQueryMiddleware для доли запросов SLOW_QUERY_SAMPLE_RATE ставит
+execute_wrapper на соединения. SQL дольше SLOW_QUERY_THRESHOLD_MS
+пишется JSON-строкой в лог core.slow_queries (ротируемый файл
+SLOW_QUERY_LOG_PATH, см. LOGGING) вместе с именем URL, отпечатком
+запроса и выводом EXPLAIN. Команда slow_queries сводит журнал по
+отпечаткам. Без SLOW_QUERY_LOG middleware отключается целиком.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Текст SQL в журнале обрезается: отпечатка и плана хватает
+SQL_LIMIT = 2000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными параметрами совпадают.
+
+    Параметры, литералы и списки IN любой длины заменяются на ?.
+    """
+    sql = sql.replace('%s', '?')
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def explain(connection, sql, params):
+    """План запроса или None, если его нельзя получить."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception:
+        return None
+    finally:
+        _local.explaining = False
+
+
+class SlowQueryRecorder:
+    """execute_wrapper: пишет в журнал запросы дольше порога."""
+
+    def __init__(self, view, threshold):
+        self.view = view
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.record(sql, params, many, context, duration)
+        return result
+
+    def record(self, sql, params, many, context, duration):
+        key = fingerprint(sql)
+        plan = None if many else explain(context['connection'], sql, params)
+        logger.warning(json.dumps(dict(
+            time=round(time.time(), 3),
+            view=self.view(),
+            fingerprint=key,
+            hash=hashlib.md5(key.encode()).hexdigest()[:12],
+            duration_ms=round(duration * 1000, 2),
+            sql=sql[:SQL_LIMIT],
+            plan=plan,
+        ), ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_LOG', False):
+            raise MiddlewareNotUsed
+        self.rate = settings.SLOW_QUERY_SAMPLE_RATE
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.rate:
+            return self.get_response(request)
+
+        def view():
+            # Имя URL известно только после разрешения пути
+            match = request.resolver_match
+            return match.view_name if match else request.path
+
+        recorder = SlowQueryRecorder(view, self.threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
+
+
+def read_log(path, backups):
+    """Записи журнала из файла и его ротированных копий."""
+    for name in [path] + [f'{path}.{number}'
+                          for number in range(1, backups + 1)]:
+        try:
+            stream = open(name, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with stream:
+            for line in stream:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def aggregate(records):
+    """Сводка по отпечаткам, от наибольшего суммарного времени."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['hash'], dict(
+            hash=record['hash'],
+            fingerprint=record['fingerprint'],
+            count=0,
+            total_ms=0.0,
+            max_ms=0.0,
+            views=set(),
+            plan=record.get('plan'),
+        ))
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        if record['duration_ms'] > group['max_ms']:
+            group['max_ms'] = record['duration_ms']
+            group['plan'] = record.get('plan') or group['plan']
+        group['views'].add(record.get('view') or '-')
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
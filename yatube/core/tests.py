@@ -1,6 +1,30 @@
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve
+
+from core import replica
+from core.anonymous import CookielessReadMiddleware
+from core.cache import SQLiteCache
+from core.metrics import registry
+from core.profiling import collapse
+from core.slow_queries import aggregate, fingerprint
+from core.writes import WriteQueue
+from posts.models import Post, User
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +32,383 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_EVERY': 1000}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_add_delete(self):
+        """Кэш хранит значения, add не перезаписывает живой ключ."""
+        self.cache.set('post', {'text': 'пост'})
+        self.assertEqual(self.cache.get('post'), {'text': 'пост'})
+        self.assertFalse(self.cache.add('post', 'другой'))
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        self.cache.set('expired', 1, 0)
+        self.assertFalse(self.cache.has_key('expired'))
+
+    def test_incr_is_shared_between_instances(self):
+        """incr виден другому экземпляру (процессу) с тем же файлом."""
+        other = SQLiteCache(self.cache._path, {})
+        self.cache.set('version', 1, None)
+        self.assertEqual(other.incr('version'), 2)
+        self.assertEqual(self.cache.get('version'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_evicts_least_recently_used(self):
+        """Сверх MAX_ENTRIES вытесняются давно не читанные записи."""
+        self.cache._lru_resolution = 0
+        for i in range(10):
+            self.cache.set(f'key{i}', i)
+        self.cache.get('key0')
+        self.cache.set('key10', 10)
+        self.cache.cull()
+        self.assertEqual(self.cache.get('key0'), 0)
+        self.assertIsNone(self.cache.get('key1'))
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(TestCase):
+    def test_server_timing_header_and_log(self):
+        """Ответ несёт Server-Timing, в лог уходит JSON-строка замеров."""
+        cache.clear()
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get('/')
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            self.assertIn(metric, header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/')
+        self.assertEqual(record['status'], HTTPStatus.OK)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled_by_setting(self):
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS=True, METRICS_FLUSH_INTERVAL=0,
+                   METRICS_PATH=os.path.join(METRICS_DIR, 'metrics.sqlite3'))
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        registry.reset()
+
+    def test_request_metrics_by_url_name(self):
+        """Запрос попадает в счётчик и гистограммы своего имени URL."""
+        cache.clear()
+        self.client.get('/')
+        body = self.client.get('/metrics/').content.decode()
+        for line in (
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:index"} 1',
+            'yatube_request_duration_seconds_bucket{view="posts:index",'
+            'le="+Inf"} 1',
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            '# TYPE yatube_cache_hit_ratio gauge',
+        ):
+            self.assertIn(line, body)
+
+    @override_settings(METRICS_SAMPLE_EVERY=2)
+    def test_details_sampled_without_timing_log(self):
+        """Без лога SQL замеряется у каждого N-го запроса."""
+        for _ in range(3):
+            self.client.get('/')
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="posts:index"} 3', body)
+        self.assertIn('yatube_request_queries_count'
+                      '{view="posts:index"} 2', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.01, 0.2, 0.3, 60):
+            registry.observe('yatube_thumbnail_seconds', value)
+        body = registry.render()
+        self.assertIn('yatube_thumbnail_seconds_bucket{le="0.05"} 1', body)
+        self.assertIn('yatube_thumbnail_seconds_bucket{le="0.5"} 3', body)
+        self.assertIn('yatube_thumbnail_seconds_bucket{le="+Inf"} 4', body)
+        self.assertIn('yatube_thumbnail_seconds_count 4', body)
+
+    def test_metrics_are_shared_between_processes(self):
+        """Сумма берётся из общего файла, а не из памяти процесса."""
+        registry.inc('yatube_thumbnail_failures_total', 2)
+        registry.flush()
+        registry._db.execute(
+            "UPDATE metrics SET value = value + 3 "
+            "WHERE name = 'yatube_thumbnail_failures_total'")
+        self.assertIn('yatube_thumbnail_failures_total 5', registry.render())
+
+    def test_failed_flush_keeps_values(self):
+        """Ошибка слива не доходит до вызывающего и не теряет значения."""
+        with override_settings(METRICS_PATH=METRICS_DIR):
+            with self.assertLogs('core.metrics', 'ERROR'):
+                registry.inc('yatube_thumbnail_failures_total', 2)
+        self.assertIn('yatube_thumbnail_failures_total 2', registry.render())
+
+    def test_metrics_hidden_from_other_addresses(self):
+        response = self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+@override_settings(SLOW_QUERY_LOG=True, SLOW_QUERY_SAMPLE_RATE=1,
+                   SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryTests(TestCase):
+    def test_fingerprint_hides_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a IN (%s, %s) AND b = 'x' "
+                        "LIMIT 21"),
+            'SELECT * FROM t WHERE a IN (...) AND b = ? LIMIT ?')
+
+    def test_slow_queries_logged_with_view_and_plan(self):
+        """Запрос выше порога пишется с именем URL и планом EXPLAIN."""
+        cache.clear()
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            self.client.get('/')
+        records = [json.loads(record.getMessage())
+                   for record in logs.records]
+        select = next(record for record in records
+                      if record['sql'].startswith('SELECT'))
+        self.assertEqual(select['view'], 'posts:index')
+        self.assertTrue(select['plan'])
+
+    def test_aggregate_by_total_time(self):
+        records = [
+            dict(hash='a', fingerprint='A', duration_ms=5, view='x'),
+            dict(hash='b', fingerprint='B', duration_ms=8, view='y'),
+            dict(hash='a', fingerprint='A', duration_ms=6, view='z'),
+        ]
+        groups = aggregate(records)
+        self.assertEqual([group['hash'] for group in groups], ['a', 'b'])
+        self.assertEqual(groups[0]['count'], 2)
+        self.assertEqual(groups[0]['views'], {'x', 'z'})
+
+
+PROFILES_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING=True, PROFILING_SAMPLE_RATE=0,
+                   PROFILING_TOKEN='secret', PROFILING_DIR=PROFILES_DIR)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+
+    def setUp(self):
+        # Каждый тест считает только свои дампы
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+        os.makedirs(PROFILES_DIR)
+
+    def dumps(self):
+        return sorted(os.listdir(PROFILES_DIR))
+
+    def test_profile_only_with_token(self):
+        """Дамп пишется только для запроса с верным заголовком."""
+        self.client.get('/', HTTP_X_PROFILE='wrong')
+        self.assertEqual(self.dumps(), [])
+        self.client.get('/', HTTP_X_PROFILE='secret')
+        dumps = self.dumps()
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].startswith('posts.index-'))
+
+    def test_merge_to_collapsed_stacks(self):
+        self.client.get('/', HTTP_X_PROFILE='secret')
+        output = io.StringIO()
+        call_command('merge_profiles', PROFILES_DIR, '--view',
+                     'posts:index', stdout=output, stderr=io.StringIO())
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines)
+        stack, micros = lines[0].rsplit(' ', 1)
+        self.assertTrue(int(micros) > 0)
+        stacks = collapse([os.path.join(PROFILES_DIR, self.dumps()[0])])
+        self.assertTrue(any('views.py' in stack for stack in stacks))
+
+
+class SQLitePragmasTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Соединение с БД получает PRAGMA из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class ReplicaTests(TestCase):
+    def setUp(self):
+        cache.delete(replica.SYNCED_KEY)
+        self.router = replica.ReplicaRouter()
+        self.middleware = replica.ReplicaMiddleware(lambda request: None)
+        self.addCleanup(setattr, replica._local, 'state', None)
+
+    def route(self, path, **cookies):
+        request = RequestFactory().get(path)
+        request.COOKIES.update(cookies)
+        request.resolver_match = resolve(path)
+        self.middleware.process_view(request, None, (), {})
+        return self.router.db_for_read(None)
+
+    def test_sync_copies_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE post (text TEXT)')
+            db.execute("INSERT INTO post VALUES ('Тест')")
+        synced = replica.sync(source, target)
+        with sqlite3.connect(target) as db:
+            rows = db.execute('SELECT text FROM post').fetchall()
+        self.assertEqual(rows, [('Тест',)])
+        self.assertEqual(cache.get(replica.SYNCED_KEY), synced)
+
+    def test_replica_only_when_fresh(self):
+        """Чтение с реплики - только если она свежее областей страницы."""
+        cache.set(replica.SYNCED_KEY, time.time())
+        self.assertEqual(self.route('/'), replica.PRIMARY)
+        replica.confirm_fresh(time.time())
+        self.assertEqual(self.router.db_for_read(None), replica.PRIMARY)
+        self.route('/')
+        replica.confirm_fresh(time.time() - 60)
+        self.assertEqual(self.router.db_for_read(None), replica.REPLICA)
+        self.assertEqual(self.router.db_for_write(None), replica.PRIMARY)
+
+    def test_writes_and_pinned_users_use_primary(self):
+        cache.set(replica.SYNCED_KEY, time.time())
+        self.route('/search/')
+        replica.confirm_fresh(0)
+        self.assertEqual(self.router.db_for_read(None), replica.PRIMARY)
+        self.route('/', **{replica.PIN_COOKIE: '1'})
+        replica.confirm_fresh(0)
+        self.assertEqual(self.router.db_for_read(None), replica.PRIMARY)
+
+    def test_write_pins_user(self):
+        response = self.client.get('/')
+        self.assertNotIn(replica.PIN_COOKIE, response.cookies)
+        self.client.force_login(
+            User.objects.create_user(username='writer'))
+        response = self.client.post('/create/', {'text': 'Тест'})
+        self.assertIn(replica.PIN_COOKIE, response.cookies)
+
+
+@override_settings(WRITE_QUEUE=True, WRITE_BATCH_WAIT=0.05)
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.queue = WriteQueue()
+
+    def test_concurrent_writes_return_results(self):
+        """Одновременные записи проходят, каждый получает свой объект."""
+        results = []
+
+        def create(number):
+            results.append(self.queue.submit(
+                Post.objects.create, author=self.user, text=f'Пост {number}'))
+
+        threads = [threading.Thread(target=create, args=(number,))
+                   for number in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(post.text for post in results),
+                         [f'Пост {number}' for number in range(5)])
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_writer_survives_unexpected_error(self):
+        """Сбой вне задания отдаётся вызывающему, поток пишет дальше."""
+        with mock.patch('core.writes.close_old_connections',
+                        side_effect=[RuntimeError('Сбой'), None]):
+            with self.assertLogs('core.writes', 'ERROR'):
+                with self.assertRaisesMessage(RuntimeError, 'Сбой'):
+                    self.queue.submit(Post.objects.create, author=self.user,
+                                      text='Пост')
+            self.queue.submit(Post.objects.create, author=self.user,
+                              text='Пост')
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_timed_out_write_is_not_committed(self):
+        """Задание, снятое по таймауту, не записывается позже."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        blocker = threading.Thread(target=self.queue.submit, args=(block,))
+        blocker.start()
+        started.wait(5)
+        with override_settings(WRITE_TIMEOUT=0.1):
+            with self.assertRaises(TimeoutError):
+                self.queue.submit(Post.objects.create, author=self.user,
+                                  text='Поздно')
+        release.set()
+        blocker.join()
+        self.queue.submit(Post.objects.create, author=self.user, text='Пост')
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Пост'])
+
+    def test_failed_write_rolled_back(self):
+        """Ошибка задания доходит до вызывающего, его запись откатывается."""
+
+        def create_and_fail():
+            Post.objects.create(author=self.user, text='Откат')
+            raise ValueError('Ошибка')
+
+        with self.assertRaisesMessage(ValueError, 'Ошибка'):
+            self.queue.submit(create_and_fail)
+        self.queue.submit(Post.objects.create, author=self.user, text='Пост')
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Пост'])
+
+
+class CookielessReadTests(TestCase):
+    def test_anonymous_read_without_cookies(self):
+        """Анонимная лента - без кук и Vary: Cookie, её можно кэшировать."""
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.cookies)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_session_cookie_keeps_session(self):
+        self.client.force_login(User.objects.create_user(username='reader'))
+        response = self.client.get('/')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        self.assertTrue(response.context['user'].is_authenticated)
+
+    def test_response_with_cookie_not_public(self):
+        """Ответ, который ставит куку, общий кэш не хранит."""
+
+        def view(request):
+            response = HttpResponse()
+            response.set_cookie('csrftoken', 'token')
+            return response
+
+        request = RequestFactory().get('/')
+        request.cookieless = True
+        response = CookielessReadMiddleware(view)(request)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_only_read_views(self):
+        response = self.client.get('/auth/login/')
+        self.assertIn('csrftoken', response.cookies)
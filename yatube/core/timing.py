@@ -0,0 +1,192 @@
+"""Лёгкие замеры запросов для боевого режима.
+
+RequestTimingMiddleware считает общее время запроса, время и число
+SQL-запросов, время рендера шаблонов и попадания/промахи кэша. Итог
+уходит в заголовок Server-Timing (его показывают DevTools браузера) и
+одной JSON-строкой в лог core.timing.
+
+Включается настройкой REQUEST_TIMING независимо от DEBUG. При
+METRICS те же замеры идут в метрики Prometheus (core.metrics). Замеры -
+несколько вызовов perf_counter на запрос и на SQL-запрос, без
+трассировок и без записи текста SQL.
+
+Если включены только метрики, каждый запрос даёт лишь число ответов
+и длительность. SQL, шаблоны и кэш замеряются у каждого
+METRICS_SAMPLE_EVERY-го запроса, счётчики кэша умножаются на шаг
+выборки.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_MISSING = object()
+_installed = False
+
+
+class Timing:
+    __slots__ = ('db', 'queries', 'template', 'hits', 'misses')
+
+    def __init__(self):
+        self.db = self.template = 0.0
+        self.queries = self.hits = self.misses = 0
+
+
+def current():
+    """Замеры текущего запроса потока или None вне запроса."""
+    return getattr(_local, 'timing', None)
+
+
+def _time_template(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        timing = current()
+        if timing is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timing.template += time.perf_counter() - started
+    return wrapper
+
+
+def _count_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        timing = current()
+        if timing is not None:
+            if value is _MISSING:
+                timing.misses += 1
+            else:
+                timing.hits += 1
+        return default if value is _MISSING else value
+    return wrapper
+
+
+def _count_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        timing = current()
+        if timing is not None:
+            timing.hits += len(found)
+            timing.misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Один раз оборачивает рендер шаблонов и чтения кэшей."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    # Вложенные {% include %} рендерятся внутри - время не двоится
+    Template.render = _time_template(Template.render)
+    for cache_class in {type(caches[alias]) for alias in settings.CACHES}:
+        cache_class.get = _count_get(cache_class.get)
+        # Базовый get_many зовёт get по ключу - их уже посчитали
+        if cache_class.get_many is not BaseCache.get_many:
+            cache_class.get_many = _count_get_many(cache_class.get_many)
+
+
+def _execute(execute, sql, params, many, context):
+    timing = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += time.perf_counter() - started
+        timing.queries += 1
+
+
+def server_timing(total, timing):
+    return ', '.join((
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+        f'tpl;dur={timing.template * 1000:.1f}',
+        f'cache;desc="{timing.hits} hits, {timing.misses} misses"',
+    ))
+
+
+def record_metrics(request, response, total, timing=None, scale=1):
+    match = request.resolver_match
+    # Без имени URL (404 и т.п.) - одна серия, чтобы не плодить метки
+    view = match.view_name if match else 'unmatched'
+    registry.inc('yatube_requests_total', view=view, method=request.method,
+                 status=response.status_code)
+    registry.observe('yatube_request_duration_seconds', total, view=view)
+    if timing is None:
+        return
+    registry.observe('yatube_request_queries', timing.queries, view=view)
+    if timing.hits:
+        registry.inc('yatube_cache_reads_total', timing.hits * scale,
+                     result='hit')
+    if timing.misses:
+        registry.inc('yatube_cache_reads_total', timing.misses * scale,
+                     result='miss')
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        self.log = getattr(settings, 'REQUEST_TIMING', False)
+        self.metrics = getattr(settings, 'METRICS', False)
+        if not (self.log or self.metrics):
+            raise MiddlewareNotUsed
+        install()
+        # Подробные замеры без лога нужны только метрикам - по выборке
+        self.every = 1 if self.log else settings.METRICS_SAMPLE_EVERY
+        self.requests = itertools.count()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if next(self.requests) % self.every:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            record_metrics(request, response, time.perf_counter() - started)
+            return response
+        timing = _local.timing = Timing()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute))
+                response = self.get_response(request)
+        finally:
+            _local.timing = None
+        total = time.perf_counter() - started
+        if self.metrics:
+            record_metrics(request, response, total, timing, self.every)
+        if not self.log:
+            return response
+        response['Server-Timing'] = server_timing(total, timing)
+        logger.info(json.dumps(dict(
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            total_ms=round(total * 1000, 1),
+            db_ms=round(timing.db * 1000, 1),
+            queries=timing.queries,
+            template_ms=round(timing.template * 1000, 1),
+            cache_hits=timing.hits,
+            cache_misses=timing.misses,
+        )))
+        return response
@@ -1,7 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию,
@@ -22,3 +26,14 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех воркеров в формате Prometheus."""
+    if (not registry.enabled
+            or request.META.get('REMOTE_ADDR')
+            not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
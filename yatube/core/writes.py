@@ -0,0 +1,142 @@
+"""Очередь записи: мелкие записи процесса идут через один поток.
+
+SQLite пускает одного писателя, и при всплеске комментариев и подписок
+воркеры толкаются за блокировку до «database is locked». write()
+передаёт функцию записи потоку-писателю со своим соединением. Поток
+забирает накопившиеся задания (до WRITE_BATCH_SIZE, ждёт попутчиков
+не дольше WRITE_BATCH_WAIT секунд) и выполняет их одной транзакцией,
+каждое - в своей точке сохранения. Вызывающий ждёт коммита и получает
+результат или исключение своей функции, как при обычном вызове.
+
+Если вызывающий уже внутри транзакции, функция выполняется на месте:
+другое соединение не увидит его незакоммиченных данных. Если поток
+не взялся за задание за WRITE_TIMEOUT секунд, задание снимается
+с очереди и вызывающий получает TimeoutError; начатое задание
+дожидается коммита.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    def __init__(self):
+        self._jobs = None
+        self._owner = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _queue(self):
+        # Поток-писатель свой у каждого процесса, в том числе после fork;
+        # упавший поток поднимается заново с той же очередью
+        pid = os.getpid()
+        with self._lock:
+            if self._owner != pid:
+                self._jobs = queue.Queue()
+                self._owner = pid
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._jobs,),
+                    name='yatube-writer', daemon=True)
+                self._thread.start()
+            return self._jobs
+
+    def submit(self, func, *args, **kwargs):
+        """Выполняет func в потоке-писателе и возвращает её результат."""
+        if not settings.WRITE_QUEUE or connection.in_atomic_block:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        future = Future()
+        self._queue().put((future, func, args, kwargs))
+        try:
+            return future.result(timeout=settings.WRITE_TIMEOUT)
+        except TimeoutError:
+            # Снятое задание поток пропустит; если он уже выполняет
+            # его, ошибка вызывающему солгала бы - ждём коммита
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _take(self, jobs):
+        batch = [jobs.get()]
+        deadline = time.monotonic() + settings.WRITE_BATCH_WAIT
+        while len(batch) < settings.WRITE_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(jobs.get(timeout=timeout))
+                else:
+                    batch.append(jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, jobs):
+        while True:
+            batch = self._take(jobs)
+            try:
+                self._record('observe', 'yatube_write_queue_depth',
+                             len(batch) + jobs.qsize())
+                self._record('observe', 'yatube_write_batch_size',
+                             len(batch))
+                self._commit(batch)
+            except Exception as error:
+                # Поток-писатель не должен умирать: иначе все следующие
+                # записи процесса ждали бы впустую
+                logger.exception('Ошибка в потоке записи')
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _record(self, method, name, value):
+        # Метрики не должны мешать записи
+        try:
+            getattr(registry, method)(name, value)
+        except Exception:
+            logger.exception('Не удалось записать метрику %s', name)
+
+    def _commit(self, batch):
+        close_old_connections()
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        # Ошибка задания откатывает только его
+                        with transaction.atomic():
+                            outcomes.append((future, func(*args, **kwargs),
+                                             None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # Не удался сам коммит: ничего из пачки не записано
+            self._record('inc', 'yatube_write_failures_total', len(batch))
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+writes = WriteQueue()
+
+
+def write(func, *args, **kwargs):
+    return writes.submit(func, *args, **kwargs)
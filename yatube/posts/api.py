@@ -0,0 +1,178 @@
+"""JSON API только для чтения: посты, пост с комментариями, подписки.
+
+Строки берутся из values() и сразу идут в JSON - модели Post не
+создаются. Пагинация по курсору (?cursor=), набор полей выбирается
+параметром ?fields=id,text,... Валидаторы ETag/Last-Modified те же,
+что у HTML-страниц (posts.conditional).
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .conditional import (author_feed_scopes, comments_scopes, conditional,
+                          follow_index_scopes, group_scopes, index_scopes,
+                          post_detail_scopes)
+from .constants import API_PAGE_SIZE, COMMENTS_PER_PAGE, CURSOR_PARAM
+from .models import Comment, Group, Post, User
+from .timeline import follow_feed
+from .utils import CursorPaginator
+
+# Поле ответа -> путь в values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail': 'thumbnail_url',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """Ошибки выбора полей - 400 с JSON вместо HTML-страницы."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except FieldsError as error:
+            return _error(str(error), HTTPStatus.BAD_REQUEST)
+    return wrapper
+
+
+def login_required_json(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Требуется авторизация', HTTPStatus.UNAUTHORIZED)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _json(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def select_fields(request, fields, required, param='fields'):
+    """Запрошенные поля ответа и колонки для values().
+
+    required нужны курсору и выбираются всегда, даже если их не
+    просили в ответе.
+    """
+    names = request.GET.get(param)
+    if not names:
+        selected = list(fields)
+    else:
+        selected = [name.strip() for name in names.split(',')
+                    if name.strip()]
+        unknown = [name for name in selected if name not in fields]
+        if unknown:
+            raise FieldsError('Неизвестные поля: {}; доступны: {}'.format(
+                ', '.join(unknown), ', '.join(fields)))
+    columns = {fields[name]: name for name in selected}
+    for name in required:
+        columns.setdefault(fields[name], None)
+    return columns
+
+
+def serialize(row, columns):
+    item = {}
+    for column, name in columns.items():
+        if name is None:
+            continue
+        value = row[column]
+        if column == 'image':
+            value = default_storage.url(value) if value else None
+        elif column == 'thumbnail_url':
+            value = value or None
+        item[name] = value
+    return item
+
+
+def paginate(request, queryset, fields, date_field, per_page,
+             param='fields'):
+    columns = select_fields(request, fields, ['id', date_field], param)
+    rows = queryset.values(*columns)
+    page = CursorPaginator(rows, per_page, date_field).get_page(
+        request.GET.get(CURSOR_PARAM))
+    return dict(
+        results=[serialize(row, columns) for row in page],
+        next=page.next_cursor,
+        previous=page.previous_cursor,
+    )
+
+
+def _posts_response(request, queryset):
+    return _json(paginate(
+        request, queryset, POST_FIELDS, 'pub_date', API_PAGE_SIZE))
+
+
+@api_view
+@conditional(index_scopes)
+def posts(request):
+    return _posts_response(request, Post.objects.all())
+
+
+@api_view
+@conditional(group_scopes)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _posts_response(request, group.posts.all())
+
+
+@api_view
+@conditional(author_feed_scopes)
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return _posts_response(request, author.posts.all())
+
+
+@api_view
+@conditional(post_detail_scopes)
+def post_detail(request, post_id):
+    """Пост и первая порция комментариев; дальше - через comments.
+
+    Поля комментариев выбираются параметром ?comment_fields=.
+    """
+    columns = select_fields(request, POST_FIELDS, [])
+    row = get_object_or_404(Post.objects.values(*columns), pk=post_id)
+    item = serialize(row, columns)
+    item['comments'] = paginate(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', COMMENTS_PER_PAGE, param='comment_fields')
+    return _json(item)
+
+
+@api_view
+@conditional(comments_scopes)
+def comments(request, post_id):
+    # Пустой список только у существующего поста
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return _json(paginate(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', COMMENTS_PER_PAGE))
+
+
+@login_required_json
+@api_view
+@conditional(follow_index_scopes)
+def follow(request):
+    return _posts_response(request, follow_feed(request.user))
@@ -0,0 +1,109 @@
+"""Условные GET (ETag/Last-Modified) по версиям областей page_cache.
+
+Валидаторы считаются до рендера шаблона: если клиент прислал
+If-None-Match/If-Modified-Since и области не менялись, view не
+вызывается и уходит 304.
+"""
+import hashlib
+import math
+from datetime import datetime, timezone
+
+from django.contrib.messages import get_messages
+from django.views.decorators.http import condition
+
+from core.replica import confirm_fresh
+
+from .models import Follow, Group, Post, User
+from .page_cache import (INDEX_SCOPE, author_scope, follows_scope, get_state,
+                         group_scope, post_scope)
+
+
+def index_scopes(request):
+    return [INDEX_SCOPE]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    return None if group_id is None else [group_scope(group_id)]
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [author_scope(author_id), follows_scope(author_id)]
+
+
+def author_feed_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    return None if author_id is None else [author_scope(author_id)]
+
+
+def post_detail_scopes(request, post_id):
+    author_id = Post.objects.filter(
+        pk=post_id).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [author_scope(author_id), post_scope(post_id)]
+
+
+def comments_scopes(request, post_id):
+    return [post_scope(post_id)]
+
+
+def follow_index_scopes(request):
+    authors = Follow.objects.filter(
+        user=request.user).values_list('author_id', flat=True)
+    return [follows_scope(request.user.pk)] + sorted(
+        author_scope(author_id) for author_id in authors)
+
+
+def request_state(scopes_func, request, *args, **kwargs):
+    """Версии и время изменения областей страницы, один раз на запрос.
+
+    None - страницы нет: scopes_func не нашла её объект.
+    """
+    # condition() зовёт etag_func и last_modified_func, а view может
+    # взять состояние для своего кэша - считаем его один раз
+    if not hasattr(request, '_posts_state'):
+        request._posts_state = None
+        scopes = scopes_func(request, *args, **kwargs)
+        if scopes is not None:
+            request._posts_state = get_state(scopes)
+            # Реплика годится, только если скопирована после
+            # последнего изменения этих областей
+            confirm_fresh(request._posts_state[1])
+    return request._posts_state
+
+
+def _state(scopes_func, request, *args, **kwargs):
+    # Сообщения выводятся один раз: такую страницу 304 отдавать нельзя
+    if len(get_messages(request)):
+        return None
+    return request_state(scopes_func, request, *args, **kwargs)
+
+
+def conditional(scopes_func):
+    """condition() с валидаторами по версиям областей scopes_func."""
+
+    def etag(request, *args, **kwargs):
+        state = _state(scopes_func, request, *args, **kwargs)
+        if state is None:
+            return None
+        versions, _ = state
+        # Шапка страницы у каждого пользователя своя
+        token = f'{request.user.pk}:{versions}'
+        return hashlib.md5(token.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = _state(scopes_func, request, *args, **kwargs)
+        if state is None:
+            return None
+        _, modified = state
+        # HTTP-дата с точностью до секунды: округляем вверх
+        return datetime.fromtimestamp(math.ceil(modified), timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -5,3 +5,53 @@ POSTS_PER_PAGE = 10
 
 # колличество букв при создании поста в формах
 NUM_OF_LETTERS = 10
+
+# имя GET-параметра курсора для keyset-пагинации
+CURSOR_PARAM = 'cursor'
+
+# FEED
+
+# с какого числа подписчиков автор считается популярным: его посты
+# не раскладываются по лентам при записи, а подтягиваются при чтении
+FEED_FANOUT_LIMIT = 1000
+
+# размер пачки bulk_create при раскладке и пересборке лент
+FEED_BATCH_SIZE = 500
+
+# сколько последних постов автора попадает в ленту задним числом:
+# при подписке, возврате автора ниже порога и пересборке лент
+FEED_DEPTH = 50
+
+# STATS
+
+# сколько пользователей сверяет reconcile_stats за один проход
+STATS_BATCH_SIZE = 1000
+
+# CACHE
+
+# сколько живут страницы лент в кэше, сек; устаревание решают версии
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# THUMBNAILS
+
+# миниатюра, которую выводят ленты и страница поста
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# сколько потоков режут картинки в фоне
+THUMBNAIL_WORKERS = 2
+
+# колличество комментариев в одной порции на странице поста
+COMMENTS_PER_PAGE = 20
+
+# сколько строк импорта пишется одной транзакцией
+IMPORT_BATCH_SIZE = 1000
+
+# сколько строк экспорта читается из БД за один fetchmany
+EXPORT_CHUNK_SIZE = 2000
+
+# сколько символов текста поста идёт в заголовок записи RSS/Atom
+FEED_TITLE_LENGTH = 60
+
+# сколько записей отдаёт JSON API за один запрос
+API_PAGE_SIZE = 20
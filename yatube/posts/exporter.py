@@ -0,0 +1,97 @@
+"""Потоковый экспорт постов и комментариев в JSON Lines или CSV.
+
+Строки читаются из БД через iterator(chunk_size) в виде values() без
+создания моделей и отдаются по одной, поэтому память не растёт с
+объёмом, а первые байты уходят сразу. Формат строк совпадает с
+форматом import_data: выгрузку можно загрузить обратно.
+"""
+import csv
+import json
+
+from .constants import EXPORT_CHUNK_SIZE
+from .models import Comment, Post
+
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Поля выгрузки по типам: имя в файле -> путь в values()
+FIELDS = {
+    'post': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comment': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+}
+
+
+def _querysets(author=None, group=None):
+    posts = Post.objects.all()
+    comments = Comment.objects.all()
+    if author is not None:
+        posts = posts.filter(author=author)
+        comments = comments.filter(post__author=author)
+    if group is not None:
+        posts = posts.filter(group=group)
+        comments = comments.filter(post__group=group)
+    return {'post': posts, 'comment': comments}
+
+
+def export_rows(types, author=None, group=None,
+                chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки словарями, по порядку типов и первичного ключа."""
+    querysets = _querysets(author, group)
+    for row_type in types:
+        fields = FIELDS[row_type]
+        values = querysets[row_type].order_by('pk').values_list(
+            *fields.values())
+        for record in values.iterator(chunk_size=chunk_size):
+            row = {'type': row_type}
+            for name, value in zip(fields, record):
+                if hasattr(value, 'isoformat'):
+                    value = value.isoformat()
+                row[name] = value
+            yield row
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, row_type):
+    """CSV одного типа: у строк разных типов разные колонки."""
+    writer = csv.writer(_Echo())
+    columns = list(FIELDS[row_type])
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            ['' if row[name] is None else row[name] for name in columns])
+
+
+def export_lines(export_format, author=None, group=None, row_type=None):
+    """Строки файла выгрузки в нужном формате."""
+    if export_format == 'csv':
+        row_type = row_type or 'post'
+        return csv_lines(export_rows([row_type], author, group), row_type)
+    types = [row_type] if row_type else list(FIELDS)
+    return jsonl_lines(export_rows(types, author, group))
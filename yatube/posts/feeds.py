@@ -0,0 +1,142 @@
+"""RSS и Atom для главной, групп и профилей.
+
+Записи берутся из тех же QuerySet, что и страницы лент. Готовый XML
+кэшируется по версиям областей page_cache, а ETag/Last-Modified
+ставит posts.conditional, поэтому опрос без новых постов стоит одного
+чтения версий из кэша и ответа 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from .conditional import (author_feed_scopes, conditional, group_scopes,
+                          index_scopes, request_state)
+from .constants import FEED_TITLE_LENGTH, PAGE_CACHE_TIMEOUT, POSTS_PER_PAGE
+from .models import Group, Post, User
+
+
+def cached_feed(scopes_func):
+    """Кэширует XML ленты до изменения версий областей scopes_func."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Состояние уже посчитал conditional для ETag
+            state = request_state(scopes_func, request, *args, **kwargs)
+            if state is None:
+                raise Http404
+            versions, _ = state
+            token = f'{request.path}:{versions}'
+            key = 'posts:feed:' + hashlib.md5(token.encode()).hexdigest()
+            cached = cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                cached = (response['Content-Type'], response.content)
+                cache.set(key, cached, PAGE_CACHE_TIMEOUT)
+            content_type, content = cached
+            # Last-Modified поставит conditional по версиям, а не Feed
+            return HttpResponse(content, content_type=content_type)
+        return conditional(scopes_func)(wrapper)
+    return decorator
+
+
+class PostsFeed(Feed):
+    def items(self, obj):
+        return self.posts(obj).cards()[:POSTS_PER_PAGE]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(FEED_TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else ()
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние посты'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_posts', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts
+
+
+class ProfileFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: посты {obj.username}'
+
+    def description(self, obj):
+        return f'Новые посты пользователя {obj.get_full_name() or obj}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class ProfileAtomFeed(ProfileFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+index_rss = cached_feed(index_scopes)(IndexFeed())
+index_atom = cached_feed(index_scopes)(IndexAtomFeed())
+group_rss = cached_feed(group_scopes)(GroupFeed())
+group_atom = cached_feed(group_scopes)(GroupAtomFeed())
+profile_rss = cached_feed(author_feed_scopes)(ProfileFeed())
+profile_atom = cached_feed(author_feed_scopes)(ProfileAtomFeed())
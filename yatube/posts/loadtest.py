@@ -0,0 +1,348 @@
+"""Нагрузочный прогон view из posts.urls внутри процесса.
+
+Запросы собираются в WSGI environ и отдаются прямо в WSGI-приложение
+проекта из пула потоков - без сети и без тестового клиента, со всеми
+middleware, сессиями и CSRF. Для каждого запроса замеряется время и
+число SQL-запросов (через connection.execute_wrapper потока).
+"""
+import io
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .constants import API_PAGE_SIZE, POSTS_PER_PAGE
+from .models import Comment, Group, Post, User
+
+# Текст постов и комментариев прогона: по нему они удаляются в конце
+BENCH_TEXT = '[bench] пост нагрузочного прогона'
+
+# Вид трафика -> вес по умолчанию
+DEFAULT_MIX = {
+    'index': 40,
+    'group': 15,
+    'profile': 15,
+    'detail': 20,
+    'follow': 5,
+    'create': 2,
+    'comment': 3,
+}
+# Виды трафика JSON API: в смесь по умолчанию не входят
+API_KINDS = ('api', 'api_detail')
+KINDS = tuple(DEFAULT_MIX) + API_KINDS
+
+# Сколько постов в ответе: для цены одного поста в api_cost
+ITEMS_PER_RESPONSE = {'index': POSTS_PER_PAGE, 'api': API_PAGE_SIZE}
+
+# Не из INTERNAL_IPS: debug_toolbar не встраивается в ответы
+REMOTE_ADDR = '10.0.0.1'
+SAMPLE_SIZE = 1000
+
+
+def parse_mix(value):
+    """'index=50,detail=50' -> {'index': 50, 'detail': 50}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in KINDS:
+            raise ValueError(f'Неизвестный вид трафика: {name}')
+        mix[name] = int(weight)
+    return mix
+
+
+def percentile(values, q):
+    """Перцентиль q (0..100) по методу ближайшего ранга."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class Sample:
+    """Случайные группы, авторы, посты и читатели из текущей БД."""
+
+    def __init__(self, size=SAMPLE_SIZE):
+        self.slugs = list(Group.objects.values_list('slug', flat=True)
+                          .order_by('?')[:size])
+        self.usernames = list(User.objects.filter(
+            stats__posts_count__gt=0).values_list(
+            'username', flat=True).order_by('?')[:size])
+        self.post_ids = list(Post.objects.values_list('pk', flat=True)
+                             .order_by('?')[:size])
+        self.reader_ids = list(User.objects.filter(
+            stats__following_count__gt=0).values_list(
+            'pk', flat=True).order_by('?')[:size])
+        if not self.post_ids:
+            raise ValueError('В базе нет постов: сначала заполните её')
+
+
+class Session:
+    """Куки и CSRF-токен одного вошедшего пользователя."""
+
+    def __init__(self, user_id):
+        store = SessionStore()
+        store[SESSION_KEY] = str(user_id)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = User.objects.get(
+            pk=user_id).get_session_auth_hash()
+        store.create()
+        self.store = store
+        request = HttpRequest()
+        self.csrf_token = get_token(request)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME: store.session_key,
+            settings.CSRF_COOKIE_NAME: request.META['CSRF_COOKIE'],
+        }
+
+
+class LoadTest:
+    def __init__(self, mix, threads, requests, seed=0, sessions=20):
+        self.mix = {name: weight for name, weight in mix.items() if weight}
+        self.threads = threads
+        self.requests = requests
+        self.seed = seed
+        self.app = get_wsgi_application()
+        self.host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS \
+            else 'localhost'
+        self.sample = Sample()
+        self.sessions = [Session(user_id) for user_id in
+                         self.sample.reader_ids[:sessions]]
+        self.results = {name: [] for name in self.mix}
+        self._lock = threading.Lock()
+
+    def _environ(self, method, path, params, session):
+        body = b''
+        query = ''
+        if method == 'POST':
+            body = urlencode(params).encode()
+        else:
+            query = urlencode(params)
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'REMOTE_ADDR': REMOTE_ADDR,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if session is not None:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in session.cookies.items())
+            environ['HTTP_X_CSRFTOKEN'] = session.csrf_token
+        return environ
+
+    def _request(self, kind, rng):
+        """Собирает (метод, путь, параметры, сессия) для вида трафика."""
+        sample = self.sample
+        page = {'page': rng.randint(1, 3)} if rng.random() < 0.3 else {}
+        if kind == 'index':
+            return 'GET', reverse('posts:index'), page, None
+        if kind == 'group' and sample.slugs:
+            return 'GET', reverse('posts:group_posts',
+                                  args=[rng.choice(sample.slugs)]), page, None
+        if kind == 'profile' and sample.usernames:
+            return 'GET', reverse('posts:profile', args=[
+                rng.choice(sample.usernames)]), page, None
+        if kind == 'detail':
+            return 'GET', reverse('posts:post_detail', args=[
+                rng.choice(sample.post_ids)]), {}, None
+        if kind == 'api':
+            return 'GET', reverse('posts:api_posts'), {}, None
+        if kind == 'api_detail':
+            return 'GET', reverse('posts:api_post_detail', args=[
+                rng.choice(sample.post_ids)]), {}, None
+        if not self.sessions:
+            return None
+        session = rng.choice(self.sessions)
+        if kind == 'follow':
+            return 'GET', reverse('posts:follow_index'), page, session
+        if kind == 'create':
+            return ('POST', reverse('posts:post_create'),
+                    {'text': BENCH_TEXT}, session)
+        if kind == 'comment':
+            return ('POST', reverse('posts:add_comment', args=[
+                rng.choice(sample.post_ids)]), {'text': BENCH_TEXT}, session)
+        return None
+
+    def _call(self, kind, rng):
+        request = self._request(kind, rng)
+        if request is None:
+            return
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        status = []
+
+        def start_response(value, headers, exc_info=None):
+            status.append(int(value.split()[0]))
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = self.app(self._environ(*request), start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.results[kind].append((elapsed, queries[0], status[0]))
+
+    def _worker(self, number, count):
+        rng = random.Random(self.seed * 1000 + number)
+        kinds = list(self.mix)
+        weights = [self.mix[kind] for kind in kinds]
+        try:
+            for _ in range(count):
+                self._call(rng.choices(kinds, weights)[0], rng)
+        finally:
+            connection.close()
+
+    def run(self):
+        per_thread, extra = divmod(self.requests, self.threads)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.threads) as executor:
+            futures = [executor.submit(self._worker, number,
+                                       per_thread + (number < extra))
+                       for number in range(self.threads)]
+            for future in futures:
+                future.result()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, duration):
+        endpoints = {}
+        everything = []
+        for kind, rows in self.results.items():
+            if not rows:
+                continue
+            everything.extend(rows)
+            endpoints[kind] = _summary(rows, duration)
+        return dict(
+            threads=self.threads,
+            seed=self.seed,
+            mix=self.mix,
+            posts=Post.objects.count(),
+            duration_s=round(duration, 3),
+            total=_summary(everything, duration),
+            endpoints=endpoints,
+        )
+
+    def cleanup(self):
+        """Удаляет сессии, посты и комментарии прогона."""
+        for session in self.sessions:
+            session.store.delete()
+        Post.objects.filter(text=BENCH_TEXT).delete()
+        Comment.objects.filter(text=BENCH_TEXT).delete()
+
+
+def _summary(rows, duration):
+    timings = [row[0] * 1000 for row in rows]
+    return dict(
+        requests=len(rows),
+        errors=sum(1 for row in rows if row[2] >= 400),
+        rps=round(len(rows) / duration, 1),
+        p50_ms=round(percentile(timings, 50), 2),
+        p95_ms=round(percentile(timings, 95), 2),
+        p99_ms=round(percentile(timings, 99), 2),
+        queries=round(sum(row[1] for row in rows) / len(rows), 2),
+    )
+
+
+@contextmanager
+def load_test(**options):
+    test = LoadTest(**options)
+    try:
+        yield test
+    finally:
+        test.cleanup()
+
+
+# Режимы замеров: (REQUEST_TIMING, METRICS). metrics - как в бою
+# по умолчанию, timing - с логом и Server-Timing на каждый запрос
+TIMING_MODES = {
+    'off': (False, False),
+    'metrics': (False, True),
+    'timing': (True, True),
+}
+
+
+def timing_overhead(**options):
+    """Одинаковые прогоны без замеров, только с метриками и со всем.
+
+    Middleware собираются при создании WSGI-приложения, поэтому каждый
+    прогон получает своё. Первый прогон прогревает кэш и не считается,
+    дальше порядок зеркальный: дрейф (кэш, размер БД) гасится.
+    Возвращает средние итоги режимов и надбавку в процентах к off.
+    """
+    order = ('off', 'off', 'metrics', 'timing', 'timing', 'metrics', 'off')
+    runs = {mode: [] for mode in TIMING_MODES}
+    for mode in order:
+        request_timing, metrics = TIMING_MODES[mode]
+        with override_settings(REQUEST_TIMING=request_timing,
+                               METRICS=metrics):
+            with load_test(**options) as test:
+                runs[mode].append(test.run()['total'])
+    runs['off'] = runs['off'][1:]
+    totals = {mode: _mean(runs[mode]) for mode in TIMING_MODES}
+    off = totals['off']
+    return dict(totals=totals, overhead={
+        mode: dict(p50_percent=_overhead(total['p50_ms'], off['p50_ms']),
+                   rps_percent=_overhead(off['rps'], total['rps']))
+        for mode, total in totals.items() if mode != 'off'
+    })
+
+
+def api_cost(**options):
+    """Цена одного поста в ленте index.html и в JSON API /api/posts/.
+
+    Один прогон, запросы к обоим поровну: p50 ответа делится на число
+    постов в нём.
+    """
+    options['mix'] = {kind: 1 for kind in ITEMS_PER_RESPONSE}
+    with load_test(**options) as test:
+        endpoints = test.run()['endpoints']
+    return {
+        kind: dict(endpoints[kind], items=items, per_item_ms=round(
+            endpoints[kind]['p50_ms'] / items, 3))
+        for kind, items in ITEMS_PER_RESPONSE.items()
+    }
+
+
+def _mean(totals):
+    return {key: round(sum(total[key] for total in totals) / len(totals), 2)
+            for key in totals[0]}
+
+
+def _overhead(slower, faster):
+    return round((slower / faster - 1) * 100, 2) if faster else None
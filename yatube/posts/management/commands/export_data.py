@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import FIELDS, FORMATS, export_lines
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты и комментарии в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--type', choices=list(FIELDS),
+                            help='Только один тип строк')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--group', help='slug группы')
+
+    def handle(self, *args, **options):
+        author = group = None
+        try:
+            if options['author']:
+                author = User.objects.get(username=options['author'])
+            if options['group']:
+                group = Group.objects.get(slug=options['group'])
+        except (User.DoesNotExist, Group.DoesNotExist) as error:
+            raise CommandError(error)
+        lines = export_lines(options['format'], author, group,
+                             options['type'])
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Делает миниатюры для постов с картинкой, у которых их ещё нет'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            thumbnail_url='').values_list('pk', flat=True)
+        done = 0
+        for post_id in posts.iterator():
+            if generate(post_id):
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Готово миниатюр: {done}'))
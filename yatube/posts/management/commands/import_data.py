@@ -0,0 +1,62 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.constants import IMPORT_BATCH_SIZE
+from posts.importer import (TYPES, Importer, read_csv, read_jsonl,
+                            rebuild_derived)
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует пользователей, группы, посты, '
+            'комментарии и подписки из JSONL или CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default='jsonl')
+        parser.add_argument('--type', choices=TYPES,
+                            help='Тип строк CSV-файла')
+        parser.add_argument('--batch-size', type=int,
+                            default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с последней записанной пачки')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересобирать ленты, счётчики и поиск')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['format'] == 'csv' and not options['type']:
+            raise CommandError('Для CSV нужен --type')
+        state_path = f'{path}.state'
+        skip = 0
+        if options['resume'] and os.path.exists(state_path):
+            with open(state_path) as state:
+                skip = json.load(state)['line']
+            self.stdout.write(f'Продолжаем после строки {skip}')
+
+        def checkpoint(line):
+            with open(state_path, 'w') as state:
+                json.dump({'line': line}, state)
+
+        importer = Importer(
+            options['batch_size'],
+            on_error=lambda line, message: self.stderr.write(
+                f'Строка {line}: {message}'),
+            on_progress=lambda importer: self.stdout.write(
+                f'Записано {importer.inserted}, '
+                f'{importer.rate:.0f} строк/с'),
+        )
+        with open(path, newline='', encoding='utf-8') as stream:
+            if options['format'] == 'csv':
+                rows = read_csv(stream, options['type'])
+            else:
+                rows = read_jsonl(stream)
+            importer.run(rows, skip=skip, checkpoint=checkpoint)
+
+        if not options['no_rebuild']:
+            rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано: {importer.inserted}, отклонено: {importer.rejected}, '
+            f'{importer.rate:.0f} строк/с'))
@@ -0,0 +1,90 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loadtest import (DEFAULT_MIX, api_cost, load_test, parse_mix,
+                            timing_overhead)
+
+COLUMNS = ('requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms',
+           'queries')
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон view posts в пуле потоков: задержки '
+            'p50/p95/p99, пропускная способность и SQL-запросы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--mix', default=','.join(
+                f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+            help='Веса видов трафика: index=40,detail=20,...; '
+                 'JSON API - api и api_detail')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--sessions', type=int, default=20,
+                            help='Сколько читателей входят на сайт')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очистить кэш перед прогоном')
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument('--timing-overhead', action='store_true',
+                            help='Сравнить прогоны без замеров, только '
+                                 'с метриками и с core.timing')
+        parser.add_argument('--api-cost', action='store_true',
+                            help='Сравнить цену одного поста в index.html '
+                                 'и в /api/posts/')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['cold']:
+            cache.clear()
+        run_options = dict(mix=mix, threads=options['threads'],
+                           requests=options['requests'],
+                           seed=options['seed'],
+                           sessions=options['sessions'])
+        try:
+            if options['timing_overhead']:
+                report = timing_overhead(**run_options)
+            elif options['api_cost']:
+                report = api_cost(**run_options)
+            else:
+                with load_test(**run_options) as test:
+                    report = test.run()
+        except ValueError as error:
+            raise CommandError(error)
+        if options['timing_overhead']:
+            self.write_overhead(report)
+        elif options['api_cost']:
+            self.write_api_cost(report)
+        else:
+            self.write_table(dict(report['endpoints'],
+                                  total=report['total']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'))
+
+    def write_table(self, rows):
+        self.stdout.write('{:>8} '.format('') + ' '.join(
+            f'{column:>9}' for column in COLUMNS))
+        for name, summary in rows.items():
+            self.stdout.write(f'{name:>8} ' + ' '.join(
+                f'{summary[column]:>9}' for column in COLUMNS))
+
+    def write_overhead(self, report):
+        self.write_table(report['totals'])
+        for mode, overhead in report['overhead'].items():
+            self.stdout.write(
+                f'Надбавка {mode}: p50 {overhead["p50_percent"]}%, '
+                f'пропускная способность {overhead["rps_percent"]}%')
+
+    def write_api_cost(self, report):
+        self.write_table(report)
+        for kind, summary in report.items():
+            self.stdout.write(f'{kind}: {summary["per_item_ms"]} мс на пост '
+                              f'({summary["items"]} в ответе)')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        total = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {total}'))
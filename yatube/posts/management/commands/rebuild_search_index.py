@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import install
+
+
+class Command(BaseCommand):
+    help = 'Ставит триггеры FTS и пересобирает поисковый индекс постов'
+
+    def handle(self, *args, **options):
+        install()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import STATS_BATCH_SIZE
+from posts.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики постов и подписок с реальными данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=STATS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        created, fixed = reconcile(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано счётчиков: {created}, исправлено: {fixed}'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.importer import rebuild_derived
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу большим набором пользователей, групп, постов, '
+            'комментариев и подписок с перекосом как в живой базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=2000000)
+        parser.add_argument('--follows', type=int, default=500000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--image-share', type=float, default=0.1,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересобирать ленты, счётчики и поиск')
+
+    def progress(self, name, done):
+        self.stdout.write(f'{name}: {done}', ending='\r')
+        self.stdout.flush()
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seeder = Seeder(options['seed'], options['batch_size'],
+                        days=options['days'],
+                        image_share=options['image_share'],
+                        on_progress=self.progress)
+        user_ids = seeder.users(options['users'])
+        group_ids = seeder.groups(options['groups'])
+        seeder.posts(options['posts'], user_ids, group_ids)
+        seeder.comments(options['comments'], user_ids)
+        seeder.follows(options['follows'], user_ids)
+        if not options['no_rebuild']:
+            self.stdout.write('\nПересобираем ленты, счётчики и поиск')
+            rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            f'\nГотово за {time.monotonic() - started:.0f} с'))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, editable=False, help_text='Готовая миниатюра картинки, заполняется в фоне', max_length=255, verbose_name='Миниатюра'),
+        ),
+    ]
@@ -16,6 +16,23 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Колонки, которые выводят карточки постов в лентах
+    CARD_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'thumbnail_url',
+        'author__username',
+        'group__title',
+        'group__slug',
+    )
+
+    def cards(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(*self.CARD_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -29,7 +46,8 @@ class Post(models.Model):
         User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -38,7 +56,8 @@ class Post(models.Model):
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     image = models.ImageField(
         verbose_name='Картинка',
@@ -46,12 +65,30 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail_url = models.CharField(
+        verbose_name='Миниатюра',
+        help_text='Готовая миниатюра картинки, заполняется в фоне',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.text
 
     class Meta():
         ordering = ('-pub_date', )
+        # Возрастающие индексы читаются задом наперёд и отдают
+        # ORDER BY pub_date DESC, id DESC без сортировки
+        indexes = [
+            models.Index(
+                fields=('author', 'pub_date'), name='post_author_date_idx'),
+            models.Index(
+                fields=('group', 'pub_date'), name='post_group_date_idx'),
+            models.Index(fields=('pub_date', ), name='post_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -60,6 +97,7 @@ class Comment(models.Model):
         verbose_name='Пост для комментария',
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -82,13 +120,18 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created', )
+        indexes = [
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
         related_name='follower',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -100,5 +143,71 @@ class Follow(models.Model):
     class Meta:
         ordering = ('-author', )
         constraints = [
-            models.CheckConstraint(name='not_same', check=~Q(user=F('author')))
+            models.CheckConstraint(
+                name='not_same', check=~Q(user=F('author'))),
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, чтобы не считать их на каждой странице."""
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Всего постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписан на авторов',
+        default=0
+    )
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.posts_count}'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель ленты',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор поста',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации поста')
+
+    class Meta:
+        ordering = ('-pub_date', )
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_date_idx'),
+            models.Index(
+                fields=('user', 'author'), name='feed_user_author_idx'),
         ]
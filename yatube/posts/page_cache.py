@@ -0,0 +1,124 @@
+"""Кэш страниц лент с версиями по областям (scope).
+
+Ключ страницы складывается из имени view, области (вся лента, группа,
+автор), номера версии области и номера страницы/курсора. Любое изменение
+поста, имени автора или группы увеличивает версии затронутых областей,
+поэтому кэш можно держать часами: старые ключи просто перестают
+запрашиваться. Те же версии
+служат валидаторами ETag/Last-Modified (см. posts.conditional).
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from .constants import CURSOR_PARAM
+from .utils import get_paginator
+
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    """Сам пост и его комментарии."""
+    return f'post:{post_id}'
+
+
+def follows_scope(user_id):
+    """Подписки пользователя и подписки на него."""
+    return f'follows:{user_id}'
+
+
+def post_scopes(post):
+    """Области, которые показывают этот пост."""
+    scopes = [INDEX_SCOPE, author_scope(post.author_id), post_scope(post.pk)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def _version_key(scope):
+    return f'posts:version:{scope}'
+
+
+def _modified_key(scope):
+    return f'posts:modified:{scope}'
+
+
+def _initial_version():
+    # Версия из времени: если ключ версии вытеснен из кэша, новая
+    # версия не совпадёт со старыми ключами страниц
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(_modified_key(scope), time.time(), None)
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_state(scopes):
+    """Версии областей и время последнего изменения любой из них."""
+    keys = [_version_key(scope) for scope in scopes]
+    keys += [_modified_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    versions = [values.get(_version_key(scope)) or get_version(scope)
+                for scope in scopes]
+    modified = [values.get(_modified_key(scope)) for scope in scopes]
+    if None in modified:
+        # Время вытеснено из кэша - считаем, что изменилось только что
+        return versions, time.time()
+    return versions, max(modified)
+
+
+def bump_versions(*scopes):
+    """Инвалидирует все страницы перечисленных областей после коммита.
+
+    До коммита читатели ещё видят старые данные: поднятая раньше
+    версия закэшировала бы их под новым ключом, а время изменения
+    пропустило бы реплику, скопированную до коммита.
+    """
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def page_cache_key(request, scope):
+    position = '{}:{}'.format(request.GET.get('page', ''),
+                              request.GET.get(CURSOR_PARAM, ''))
+    digest = hashlib.md5(position.encode()).hexdigest()
+    view = request.resolver_match.url_name
+    return f'posts:page:{view}:{scope}:{get_version(scope)}:{digest}'
+
+
+def cached_page(request, queryset, scope):
+    """Страница ленты и ключ её фрагмента для {% cache %} в шаблоне.
+
+    В кэш попадает только отрисованный фрагмент - посты вместе с
+    пагинатором, поэтому page_obj ленивый: к БД он идёт, лишь когда
+    фрагмента в кэше нет.
+    """
+    key = page_cache_key(request, scope)
+    return SimpleLazyObject(lambda: get_paginator(request, queryset)), key
@@ -0,0 +1,123 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+posts_post_fts - FTS5-таблица с внешним содержимым (content=posts_post):
+индекс хранит только токены, а текст берётся из posts_post. Триггеры
+на posts_post держат индекс в синхронизации при создании, правке и
+удалении постов, в том числе через bulk_create и update().
+"""
+import base64
+import binascii
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .constants import POSTS_PER_PAGE
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Пересборка таблицы Post при миграции на SQLite теряет триггеры,
+# rebuild_search_index ставит их заново
+TRIGGERS_SQL = (
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+# Маркеры подсветки: их нет в тексте поста, поэтому текст можно
+# экранировать целиком и потом заменить маркеры на <mark>
+MARK_START, MARK_END = '\x02', '\x03'
+
+SEARCH_SQL = f"""
+    SELECT {FTS_TABLE}.rowid,
+           snippet({FTS_TABLE}, 0, %s, %s, '…', 16),
+           bm25({FTS_TABLE}) AS rank
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s {{after}}
+    ORDER BY rank, {FTS_TABLE}.rowid
+    LIMIT %s
+"""
+AFTER_SQL = (f'AND (bm25({FTS_TABLE}) > %s OR (bm25({FTS_TABLE}) = %s '
+             f'AND {FTS_TABLE}.rowid > %s))')
+
+
+def install():
+    """Ставит триггеры и пересобирает индекс по текущим постам."""
+    with connection.cursor() as cursor:
+        for statement in TRIGGERS_SQL:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Запрос пользователя как безопасное выражение FTS5.
+
+    Каждое слово ищется как префикс в кавычках, поэтому операторы и
+    кавычки из запроса не ломают синтаксис MATCH.
+    """
+    terms = query.split()
+    return ' '.join('"{}"*'.format(term.replace('"', '""'))
+                    for term in terms)
+
+
+def encode_cursor(rank, pk):
+    value = f'{rank!r}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+def search_posts(query, cursor=None, limit=POSTS_PER_PAGE):
+    """Посты по релевантности с подсветкой: (посты, курсор дальше)."""
+    match = match_expression(query)
+    if not match:
+        return [], None
+    params = [MARK_START, MARK_END, match]
+    after = ''
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        rank, pk = position
+        after = AFTER_SQL
+        params += [rank, rank, pk]
+    params.append(limit + 1)
+    with connection.cursor() as db:
+        db.execute(SEARCH_SQL.format(after=after), params)
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+    posts = Post.objects.cards().in_bulk([row[0] for row in rows])
+    results = []
+    for pk, snippet, _ in rows:
+        post = posts.get(pk)
+        if post is not None:
+            post.snippet = _highlight(snippet)
+            results.append(post)
+    return results, next_cursor
@@ -0,0 +1,192 @@
+"""Генерация большого правдоподобного набора данных.
+
+Распределения с перекосом, как в живой базе: число постов автора и
+число подписчиков подчиняются степенному закону (Zipf), так что есть
+несколько очень плодовитых и очень популярных авторов и длинный хвост
+почти пустых. Всё определяется seed: один и тот же seed даёт одни и
+те же данные, даты отсчитываются от SEED_EPOCH, а не от текущего
+времени. Запрошенное число строк соблюдается точно: повторы, которые
+отбросил ignore_conflicts, добираются новыми строками. Строки пишутся
+bulk_create пачками, тексты собираются
+из заранее сгенерированного Faker пула предложений - сам Faker на
+миллион постов работал бы слишком долго.
+"""
+import io
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from .importer import keep_dates
+from .models import Comment, Follow, Group, Post, User
+
+LOCALE = 'ru_RU'
+SENTENCES = 5000
+IMAGES = 20
+IMAGE_DIR = 'posts/seed'
+# Показатель степени Zipf: чем больше, тем сильнее перекос
+ZIPF_EXPONENT = 1.1
+# Один пароль на всех: хэш считается один раз
+SEED_PASSWORD = 'password'
+# Дата последнего поста набора: от неё отсчитываются все даты
+SEED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(size, exponent=ZIPF_EXPONENT):
+    """Накопленные веса Zipf для random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+class Seeder:
+    def __init__(self, seed, batch_size, days=365, image_share=0.1,
+                 on_progress=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker(LOCALE)
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.image_share = image_share
+        self.on_progress = on_progress or (lambda name, done: None)
+        self.sentences = [self.fake.sentence(nb_words=10)
+                          for _ in range(SENTENCES)]
+
+    def _text(self, low, high):
+        return ' '.join(self.rng.choices(self.sentences,
+                                         k=self.rng.randint(low, high)))
+
+    def _insert(self, name, model, objects, count):
+        """Вставляет ровно count строк из бесконечного генератора.
+
+        Пишет bulk_create пачками, память - одна пачка. Возвращает pk
+        вставленных строк по порядку: bulk_create на SQLite их не
+        отдаёт, поэтому берутся строки с pk больше прежнего максимума -
+        пока транзакция пишет, другие писатели SQLite ждут.
+        """
+        ids = []
+        while len(ids) < count:
+            batch = list(itertools.islice(
+                objects, min(self.batch_size, count - len(ids))))
+            with transaction.atomic():
+                last = model.objects.aggregate(last=Max('pk'))['last']
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                ids.extend(model.objects.filter(
+                    pk__gt=last or 0).order_by('pk').values_list(
+                    'pk', flat=True))
+            self.on_progress(name, len(ids))
+        return ids
+
+    def users(self, count):
+        password = make_password(SEED_PASSWORD)
+        objects = (User(username=f'{self.fake.user_name()}{number}',
+                        first_name=self.fake.first_name(),
+                        last_name=self.fake.last_name(),
+                        email=self.fake.email(),
+                        password=password)
+                   for number in itertools.count())
+        # Порядок важен для Zipf: первые пользователи - самые активные
+        return self._insert('users', User, objects, count)
+
+    def groups(self, count):
+        objects = (Group(slug=f'group-{number}',
+                         title=self.fake.catch_phrase()[:200],
+                         description=self._text(1, 3))
+                   for number in itertools.count())
+        return self._insert('groups', Group, objects, count)
+
+    def images(self):
+        """Небольшой набор настоящих картинок для доли постов."""
+        names = []
+        for number in range(IMAGES):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+            name = f'{IMAGE_DIR}/seed_{number}.jpg'
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def posts(self, count, user_ids, group_ids):
+        """Посты от старых к новым; авторы по Zipf."""
+        weights = zipf_weights(len(user_ids))
+        images = self.images() if self.image_share else []
+        step = timedelta(days=self.days) / max(count, 1)
+        start = SEED_EPOCH - timedelta(days=self.days)
+
+        def generate():
+            for number in itertools.count(1):
+                author_id = self.rng.choices(user_ids, cum_weights=weights)[0]
+                yield Post(
+                    author_id=author_id,
+                    group_id=(self.rng.choice(group_ids)
+                              if group_ids and self.rng.random() < 0.6
+                              else None),
+                    text=self._text(1, 8),
+                    pub_date=start + step * number,
+                    image=(self.rng.choice(images)
+                           if images and self.rng.random() < self.image_share
+                           else ''),
+                )
+        with keep_dates():
+            return len(self._insert('posts', Post, generate(), count))
+
+    def comments(self, count, user_ids):
+        """Комментарии к постам: у свежих и у старых поровну, длина разная.
+
+        Посты читаются по pk пачками, на каждый приходится в среднем
+        count / число постов комментариев с экспоненциальным разбросом.
+        Дробная часть округляется случайно, чтобы среднее сохранилось;
+        недобор после прохода по всем постам добирается следующим.
+        """
+        total_posts = Post.objects.count()
+        if not total_posts or not count:
+            return 0
+        mean = count / total_posts
+
+        def generate():
+            posts = Post.objects.order_by('pk').values_list('pk', 'pub_date')
+            while True:
+                for post_id, pub_date in posts.iterator(
+                        chunk_size=self.batch_size):
+                    number = int(self.rng.expovariate(1 / mean)
+                                 + self.rng.random())
+                    for _ in range(number):
+                        yield Comment(
+                            post_id=post_id,
+                            author_id=self.rng.choice(user_ids),
+                            text=self._text(1, 2),
+                            created=pub_date + timedelta(
+                                minutes=self.rng.expovariate(1 / 60)),
+                        )
+        with keep_dates():
+            return len(self._insert('comments', Comment, generate(), count))
+
+    def follows(self, count, user_ids):
+        """Подписки: читатель случайный, автор по Zipf.
+
+        Подписки на себя и повторы пар не считаются, вместо них
+        выбираются новые пары.
+        """
+        if count > len(user_ids) * (len(user_ids) - 1):
+            raise ValueError(
+                f'Между {len(user_ids)} пользователями нет {count} подписок')
+        weights = zipf_weights(len(user_ids))
+
+        def generate():
+            seen = set()
+            while True:
+                author_id = self.rng.choices(user_ids, cum_weights=weights)[0]
+                user_id = self.rng.choice(user_ids)
+                if user_id != author_id and (user_id, author_id) not in seen:
+                    seen.add((user_id, author_id))
+                    yield Follow(user_id=user_id, author_id=author_id)
+        return len(self._insert('follows', Follow, generate(), count))
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import stats, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .page_cache import (INDEX_SCOPE, author_scope, bump_versions,
+                         follows_scope, group_scope, post_scope, post_scopes)
+
+# Поля, которые видны в карточках постов
+CARD_USER_FIELDS = {'username'}
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, **kwargs):
+    """Новому пользователю заводим нулевые счётчики."""
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, update_fields,
+                            **kwargs):
+    """Имя автора есть в карточках его постов во всех лентах."""
+    if created or (update_fields is not None
+                   and not CARD_USER_FIELDS & set(update_fields)):
+        # Вход пишет только last_login - ленты от этого не меняются
+        return
+    groups = Post.objects.filter(
+        author=instance, group__isnull=False).order_by().values_list(
+        'group_id', flat=True).distinct()
+    bump_versions(INDEX_SCOPE, author_scope(instance.pk),
+                  *(group_scope(group_id) for group_id in groups))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_pages(sender, instance, created, **kwargs):
+    """Название и адрес группы есть в карточках её постов."""
+    if created:
+        return
+    authors = Post.objects.filter(group=instance).order_by().values_list(
+        'author_id', flat=True).distinct()
+    bump_versions(INDEX_SCOPE, group_scope(instance.pk),
+                  *(author_scope(author_id) for author_id in authors))
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_scopes(sender, instance, **kwargs):
+    """При правке запоминаем, в каких лентах пост был до неё."""
+    if instance.pk is None:
+        return
+    old = Post.objects.filter(pk=instance.pk).only('author', 'group').first()
+    if old is not None:
+        instance._old_scopes = post_scopes(old)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = set(post_scopes(instance))
+    scopes.update(getattr(instance, '_old_scopes', ()))
+    bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора."""
+    if created:
+        stats.bump(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+    bump_versions(*post_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    """После подписки в ленту добавляются старые посты автора."""
+    if created:
+        stats.bump(instance.author_id, followers_count=1)
+        stats.bump(instance.user_id, following_count=1)
+        bump_versions(follows_scope(instance.user_id),
+                      follows_scope(instance.author_id))
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты."""
+    stats.bump(instance.author_id, followers_count=-1)
+    stats.bump(instance.user_id, following_count=-1)
+    bump_versions(follows_scope(instance.user_id),
+                  follows_scope(instance.author_id))
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    """Комментарии меняют страницу поста."""
+    bump_versions(post_scope(instance.post_id))
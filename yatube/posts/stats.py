@@ -0,0 +1,82 @@
+"""Денормализованные счётчики постов и подписок пользователя."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .constants import STATS_BATCH_SIZE
+from .models import AuthorStats, Follow, Post, User
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики одним UPDATE: posts_count=1, followers_count=-1.
+
+    Отсутствующую строку не создаёт - её посчитает get_stats
+    при чтении или reconcile. Счётчик не уходит ниже нуля, даже если
+    успел разойтись с таблицами до reconcile.
+    """
+    AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)
+           for field, delta in deltas.items()})
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def counted_users():
+    """Пользователи с реальными счётчиками, посчитанными в одном запросе."""
+    return User.objects.annotate(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    ).order_by('pk')
+
+
+def get_stats(user):
+    """Счётчики пользователя; при отсутствии строки считает её заново."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        row = counted_users().values(*STATS_FIELDS).get(pk=user.pk)
+        stats, _ = AuthorStats.objects.get_or_create(user=user, defaults=row)
+        return stats
+
+
+def reconcile(batch_size=STATS_BATCH_SIZE):
+    """Сверяет счётчики со счётом по таблицам пачками.
+
+    Возвращает (создано, исправлено).
+    """
+    created = fixed = 0
+    rows = counted_users().values_list('pk', *STATS_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            created, fixed = _reconcile_batch(batch, created, fixed)
+            batch = []
+    if batch:
+        created, fixed = _reconcile_batch(batch, created, fixed)
+    return created, fixed
+
+
+def _reconcile_batch(batch, created, fixed):
+    existing = AuthorStats.objects.in_bulk([row[0] for row in batch])
+    to_create, to_update = [], []
+    for user_id, *counts in batch:
+        actual = dict(zip(STATS_FIELDS, counts))
+        stats = existing.get(user_id)
+        if stats is None:
+            to_create.append(AuthorStats(user_id=user_id, **actual))
+        elif any(getattr(stats, f) != v for f, v in actual.items()):
+            for field, value in actual.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+    AuthorStats.objects.bulk_create(to_create)
+    AuthorStats.objects.bulk_update(to_update, STATS_FIELDS)
+    return created + len(to_create), fixed + len(to_update)
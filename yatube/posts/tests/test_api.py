@@ -0,0 +1,85 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.constants import API_PAGE_SIZE
+from posts.models import Comment, Follow, Group, Post, User
+
+USER_NAME = 'auth'
+READER_NAME = 'reader'
+GROUP_SLUG = 'cats'
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=USER_NAME)
+        cls.reader = User.objects.create(username=READER_NAME)
+        cls.group = Group.objects.create(slug=GROUP_SLUG, title='Котики')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(API_PAGE_SIZE + 5))
+        cls.post = Post.objects.create(author=cls.author, text='Последний')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, params=None, **kwargs):
+        return self.client.get(reverse(f'posts:{name}', kwargs=kwargs),
+                               params or {})
+
+    def test_cursor_walks_all_posts(self):
+        """Курсор проходит все посты без повторов."""
+        data = self.get('api_posts').json()
+        self.assertEqual(len(data['results']), API_PAGE_SIZE)
+        self.assertEqual(data['results'][0]['text'], 'Последний')
+        rest = self.get('api_posts', {'cursor': data['next']}).json()
+        ids = {row['id'] for row in data['results'] + rest['results']}
+        self.assertEqual(ids, set(Post.objects.values_list('pk', flat=True)))
+        self.assertIsNone(rest['next'])
+
+    def test_field_selection(self):
+        """?fields= оставляет в ответе только запрошенные поля."""
+        data = self.get('api_posts', {'fields': 'text,author'}).json()
+        self.assertEqual(set(data['results'][0]), {'text', 'author'})
+        self.assertEqual(data['results'][0]['author'], USER_NAME)
+        response = self.get('api_posts', {'fields': 'text,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_list_is_single_query(self):
+        """Страница списка - один запрос без COUNT(*) и моделей."""
+        with self.assertNumQueries(1):
+            self.get('api_posts')
+
+    def test_group_and_profile(self):
+        group = self.get('api_group_posts', slug=GROUP_SLUG).json()
+        self.assertEqual(group['results'][0]['group'], GROUP_SLUG)
+        profile = self.get('api_profile_posts', username=READER_NAME).json()
+        self.assertEqual(profile['results'], [])
+        response = self.get('api_group_posts', slug='missing')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_post_detail_with_comments(self):
+        data = self.get('api_post_detail', post_id=self.post.pk).json()
+        self.assertEqual(data['text'], 'Последний')
+        self.assertEqual(data['comments']['results'][0]['author'],
+                         READER_NAME)
+        data = self.get('api_comments', post_id=self.post.pk,
+                        params={'fields': 'text'}).json()
+        self.assertEqual(data['results'], [{'text': 'Комментарий'}])
+        response = self.get('api_comments', post_id=self.post.pk + 1)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и отдаёт посты авторов."""
+        response = self.get('api_follow')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.client.force_login(self.reader)
+        data = self.get('api_follow').json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User
+from posts.page_cache import INDEX_SCOPE, bump_versions, get_state
+from posts.tests.utils import bump_immediately
+
+USER_NAME = 'auth'
+READER_NAME = 'reader'
+POST_TEXT = 'Тестовый пост'
+COMMENT_TEXT = 'Тестовый комментарий'
+
+
+@bump_immediately
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username=USER_NAME)
+        self.reader = User.objects.create(username=READER_NAME)
+        self.post = Post.objects.create(author=self.author, text=POST_TEXT)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': USER_NAME}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        )
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменённая страница отвечает 304 на If-None-Match."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertEqual(self.revalidate(url, response).status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и комментарий меняют ETag затронутых страниц."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        Post.objects.create(author=self.author, text=POST_TEXT)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text=COMMENT_TEXT)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response).status_code,
+                                 HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        """Другой пользователь не получает чужую страницу по ETag."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(
+            Client().get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            HTTPStatus.OK)
+
+
+class BumpOnCommitTests(TestCase):
+    def test_versions_bumped_after_commit(self):
+        """До коммита версия и время изменения области прежние."""
+        cache.clear()
+        get_state([INDEX_SCOPE])
+        state = get_state([INDEX_SCOPE])
+        bump_versions(INDEX_SCOPE)
+        self.assertEqual(get_state([INDEX_SCOPE]), state)
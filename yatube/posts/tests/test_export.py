@@ -0,0 +1,57 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.importer import Importer, read_jsonl
+from posts.models import Comment, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='leo')
+        cls.other = User.objects.create(username='ann')
+        cls.group = Group.objects.create(slug='cats', title='Котики')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Мой пост')
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_author_streams_own_content(self):
+        """Автор получает потоком только свои посты и комментарии к ним."""
+        response = self.client.get(reverse('posts:export'))
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['type'] for row in rows], ['post', 'comment'])
+        self.assertEqual(rows[0]['group'], 'cats')
+        self.assertEqual(rows[1]['post'], self.post.pk)
+
+    def test_csv_has_header_and_one_type(self):
+        """CSV выгружает один тип строк с заголовком."""
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'csv', 'type': 'comment'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,post,author,text,created')
+        self.assertEqual(len(lines), 2)
+
+    def test_export_requires_login(self):
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_output_can_be_imported(self):
+        """Выгрузка группы загружается обратно через импорт."""
+        output = io.StringIO()
+        call_command('export_data', '--group', 'cats', stdout=output)
+        Post.objects.all().delete()
+        Importer(10).run(read_jsonl(io.StringIO(output.getvalue())))
+        self.assertEqual(Post.objects.get().text, 'Мой пост')
+        self.assertEqual(Comment.objects.get().text, 'Комментарий')
@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.tests.utils import bump_immediately
+
+USER_NAME = 'auth'
+GROUP_SLUG = 'cats'
+
+
+@bump_immediately
+class FeedsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username=USER_NAME)
+        self.group = Group.objects.create(slug=GROUP_SLUG, title='Котики')
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text='Первый пост в ленте')
+        self.client = Client()
+        self.urls = [
+            reverse(f'posts:{name}_{kind}', kwargs=kwargs)
+            for name, kwargs in (('index', {}),
+                                 ('group', {'slug': GROUP_SLUG}),
+                                 ('profile', {'username': USER_NAME}))
+            for kind in ('rss', 'atom')
+        ]
+
+    def test_feeds_list_posts(self):
+        """Ленты RSS и Atom отдают посты с валидаторами."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Первый пост в ленте')
+                self.assertIn('xml', response['Content-Type'])
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_unchanged_feed_returns_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_invalidates_feed(self):
+        """Новый пост сразу появляется в закэшированной ленте."""
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Второй пост в ленте')
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url),
+                                    'Второй пост в ленте')
+
+    def test_unknown_group_returns_404(self):
+        response = self.client.get(
+            reverse('posts:group_rss', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cached_feed_looks_up_scopes_once(self):
+        """Закэшированная лента группы - один запрос: поиск группы."""
+        url = reverse('posts:group_rss', kwargs={'slug': GROUP_SLUG})
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.constants import IMPORT_BATCH_SIZE
+from posts.importer import Importer, read_csv, read_jsonl
+from posts.models import Comment, Follow, Group, Post, User
+
+ROWS = [
+    {'type': 'user', 'username': 'leo'},
+    {'type': 'user', 'username': 'ann'},
+    {'type': 'group', 'slug': 'cats', 'title': 'Котики'},
+    {'type': 'post', 'id': 7, 'author': 'leo', 'group': 'cats',
+     'text': 'Первый', 'pub_date': '2020-01-02T03:04:05+00:00'},
+    {'type': 'comment', 'post': 7, 'author': 'ann', 'text': 'Привет'},
+    {'type': 'follow', 'user': 'ann', 'author': 'leo'},
+    {'type': 'follow', 'user': 'ann', 'author': 'ann'},
+    {'type': 'post', 'author': 'nobody', 'text': 'Сирота'},
+]
+
+
+def jsonl(rows):
+    return io.StringIO('\n'.join(json.dumps(row) for row in rows))
+
+
+class ImporterTests(TestCase):
+    def test_import_rejects_only_bad_rows(self):
+        """Ошибочные строки отклоняются, остальные из пачки записаны."""
+        errors = []
+        importer = Importer(100, on_error=lambda line, message:
+                            errors.append(line))
+        importer.run(read_jsonl(jsonl(ROWS)))
+        self.assertEqual(sorted(errors), [7, 8])
+        self.assertEqual(importer.rejected, 2)
+        post = Post.objects.get(pk=7)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertTrue(Comment.objects.filter(post=post).exists())
+        self.assertTrue(Follow.objects.filter(
+            user__username='ann', author__username='leo').exists())
+
+    def test_reimport_is_idempotent(self):
+        """Повторный импорт тех же строк не создаёт дублей."""
+        for _ in range(2):
+            Importer(3).run(read_jsonl(jsonl(ROWS)))
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_inserted_counts_only_new_rows(self):
+        """Пропущенные конфликты не попадают в число записанных."""
+        rows = [row for row in ROWS if row['type'] != 'comment']
+        Importer(100).run(read_jsonl(jsonl(rows)))
+        importer = Importer(100)
+        importer.run(read_jsonl(jsonl(rows)))
+        self.assertEqual(importer.inserted, 0)
+
+    def test_default_batch_size(self):
+        """Пачка размера по умолчанию не упирается в лимиты SQLite."""
+        rows = [{'type': 'user', 'username': 'leo'}] + [
+            {'type': 'post', 'id': pk, 'author': 'leo', 'text': str(pk)}
+            for pk in range(1, IMPORT_BATCH_SIZE + 1)]
+        importer = Importer(IMPORT_BATCH_SIZE)
+        importer.run(read_jsonl(jsonl(rows)))
+        self.assertEqual(Post.objects.count(), IMPORT_BATCH_SIZE)
+        self.assertEqual(importer.inserted, IMPORT_BATCH_SIZE + 1)
+
+    def test_csv_rows(self):
+        """CSV читается с типом из аргумента, пустые ячейки опускаются."""
+        stream = io.StringIO('username,email\nleo,\nann,ann@example.com\n')
+        Importer(10).run(read_csv(stream, 'user'))
+        self.assertEqual(User.objects.get(username='ann').email,
+                         'ann@example.com')
+
+    def test_command_resumes_from_state(self):
+        """--resume пропускает строки, записанные в прошлый запуск."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.jsonl')
+            with open(path, 'w') as dump:
+                dump.write(jsonl(ROWS[:2]).getvalue())
+            with open(f'{path}.state', 'w') as state:
+                json.dump({'line': 1}, state)
+            call_command('import_data', path, '--resume',
+                         stdout=io.StringIO())
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)), ['ann'])
+        self.assertEqual(User.objects.get(username='ann').stats.posts_count,
+                         0)
@@ -0,0 +1,58 @@
+from django.db import connection
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User
+
+USER_NAME = 'auth'
+AUTHOR_NAME = 'author'
+GROUP_SLUG = 'test-slug'
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USER_NAME)
+        cls.author = User.objects.create(username=AUTHOR_NAME)
+        cls.group = Group.objects.create(title='Группа', slug=GROUP_SLUG,
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Тестовый пост')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.plan(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_hot_queries_use_indexes(self):
+        """Горячие запросы идут по индексам и не сортируются отдельно."""
+        cases = {
+            'post_author_date_idx':
+                Post.objects.filter(author=self.author)[:10],
+            'post_group_date_idx':
+                Post.objects.filter(group=self.group)[:10],
+            'post_date_idx': Post.objects.all()[:10],
+            'comment_post_created_idx':
+                Comment.objects.filter(post=self.post)[:10],
+        }
+        for index_name, queryset in cases.items():
+            with self.subTest(index=index_name):
+                self.assertUsesIndex(queryset, index_name)
+
+    def test_cursor_ordering_uses_index(self):
+        """Порядок keyset-пагинации (pub_date, id) не требует сортировки."""
+        queryset = Post.objects.filter(
+            author=self.author).order_by('-pub_date', '-pk')[:10]
+        self.assertUsesIndex(queryset, 'post_author_date_idx')
+
+    def test_follow_lookup_uses_unique_index(self):
+        """Поиск подписки по (user, author) идёт по уникальному индексу."""
+        plan = self.plan(
+            Follow.objects.filter(user=self.user, author=self.author))
+        self.assertIn('INDEX', plan)
+        self.assertNotIn('SCAN', plan.replace('SCAN CONSTANT', ''))
@@ -0,0 +1,51 @@
+import random
+
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import TestCase
+
+from posts.loadtest import (BENCH_TEXT, KINDS, LoadTest, parse_mix,
+                            percentile)
+from posts.models import Follow, Group, Post, User
+
+
+class LoadTestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        group = Group.objects.create(slug='cats', title='Котики')
+        Post.objects.create(author=author, group=group, text='Тестовый пост')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        # Как и тестовый клиент: не закрываем соединение теста по сигналам
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('index=3,detail=1'),
+                         {'index': 3, 'detail': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('admin=1')
+
+    def test_every_kind_is_served(self):
+        """Каждый вид трафика проходит через WSGI без ошибок."""
+        test = LoadTest(dict.fromkeys(KINDS, 1), threads=1, requests=0)
+        rng = random.Random(0)
+        for kind in KINDS:
+            test._call(kind, rng)
+        for kind, rows in test.results.items():
+            with self.subTest(kind=kind):
+                elapsed, queries, status = rows[0]
+                self.assertLess(status, 400)
+                self.assertGreater(queries, 0)
+        test.cleanup()
+        self.assertFalse(Post.objects.filter(text=BENCH_TEXT).exists())
@@ -0,0 +1,53 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import search_posts
+
+USER_NAME = 'auth'
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USER_NAME)
+        cls.cat = Post.objects.create(author=cls.user,
+                                      text='Котики <b>спят</b> весь день')
+        cls.dog = Post.objects.create(author=cls.user,
+                                      text='Собаки гуляют весь день')
+
+    def search(self, query, **params):
+        response = Client().get(reverse('posts:search'),
+                                dict(q=query, **params))
+        return response
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск находит пост и подсвечивает совпадение, экранируя HTML."""
+        response = self.search('котик')
+        self.assertEqual(response.context['posts'], [self.cat])
+        self.assertContains(response, '<mark>Котики</mark>')
+        self.assertContains(response, '&lt;b&gt;спят&lt;/b&gt;')
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        # Объекты класса общие для тестов: меняем свои копии
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Кошки гуляют сами по себе'
+        dog.save()
+        self.assertEqual(self.search('собаки').context['posts'], [])
+        self.assertEqual(self.search('кошки').context['posts'], [dog])
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertEqual(self.search('котики').context['posts'], [])
+
+    def test_cursor_pagination(self):
+        """Курсор отдаёт следующую порцию без повторов."""
+        first, cursor = search_posts('день', limit=1)
+        second, last_cursor = search_posts('день', cursor, limit=1)
+        self.assertEqual(len(first + second), 2)
+        self.assertEqual(set(first + second), {self.cat, self.dog})
+        self.assertIsNone(last_cursor)
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS в запросе не ломают поиск."""
+        response = self.search('"день AND OR (')
+        self.assertEqual(response.status_code, 200)
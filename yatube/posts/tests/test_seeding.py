@@ -0,0 +1,66 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.seeding import zipf_weights
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, seed=1):
+        call_command('seed_data', '--users', '30', '--groups', '3',
+                     '--posts', '300', '--comments', '300', '--follows',
+                     '200', '--seed', str(seed), '--batch-size', '50',
+                     '--image-share', '0.5', '--no-rebuild',
+                     stdout=io.StringIO())
+
+    def test_counts_and_skew(self):
+        """Посты и подписчики сосредоточены у первых авторов."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 200)
+        self.assertGreater(Post.objects.exclude(image='').count(), 0)
+        top = Post.objects.values('author').annotate(
+            total=Count('pk')).order_by('-total')
+        self.assertGreater(top[0]['total'], 300 / 30 * 3)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username', 'pub_date'))
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username', 'pub_date'))
+        self.assertEqual(first, second)
+
+    def test_reseed_adds_exact_counts(self):
+        """Повторный запуск добавляет столько же, несмотря на конфликты."""
+        self.seed()
+        self.seed()
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertEqual(Follow.objects.count(), 400)
+
+    def test_zipf_weights_are_cumulative(self):
+        weights = zipf_weights(3, exponent=1)
+        self.assertEqual(weights, [1, 1.5, 1.5 + 1 / 3])
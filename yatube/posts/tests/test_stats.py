@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post, User
+
+FOLLOWER_NAME = 'follower'
+AUTHOR_NAME = 'author'
+POST_TEXT = 'Тестовый пост'
+
+
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        self.follower = User.objects.create(username=FOLLOWER_NAME)
+        self.author = User.objects.create(username=AUTHOR_NAME)
+        self.post = Post.objects.create(author=self.author, text=POST_TEXT)
+        Follow.objects.create(user=self.follower, author=self.author)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются при создании и удалении постов и подписок."""
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (1, 1))
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.follower).following_count, 1)
+        self.post.delete()
+        Follow.objects.all().delete()
+        stats.refresh_from_db()
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (0, 0))
+
+    def test_profile_reads_stored_counters(self):
+        """Профиль не считает посты и подписчиков на лету."""
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': AUTHOR_NAME}))
+        self.assertEqual(response.context['stats'].posts_count, 1)
+        self.assertEqual(response.context['stats'].followers_count, 1)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_stats чинит разъехавшиеся и пропавшие счётчики."""
+        AuthorStats.objects.filter(user=self.author).update(posts_count=42)
+        AuthorStats.objects.filter(user=self.follower).delete()
+        call_command('reconcile_stats', stdout=mock.MagicMock())
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.follower).following_count, 1)
+
+    def test_drifted_counter_stays_at_zero(self):
+        """Удаление при счётчике, ушедшем в ноль, не падает."""
+        AuthorStats.objects.filter(user=self.author).update(posts_count=0)
+        self.post.delete()
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 0)
@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.tests.utils import bump_immediately
+from posts.thumbnails import generate
+
+USER_NAME = 'auth'
+POST_TEXT = 'Тестовый пост'
+FILE_NAME_FOR_TEST = 'small.gif'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@bump_immediately
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=User.objects.create(username=USER_NAME),
+            text=POST_TEXT,
+            image=SimpleUploadedFile(FILE_NAME_FOR_TEST, SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+
+    def test_page_shows_original_until_thumbnail_ready(self):
+        """Пока миниатюры нет, лента отдаёт исходную картинку."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_generated_thumbnail_is_stored_and_rendered(self):
+        """Готовая миниатюра сохраняется и сразу видна в ленте."""
+        Client().get(reverse('posts:index'))
+        url = generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_url, url)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, url)
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.constants import POSTS_PER_PAGE
+from posts.models import FeedEntry, Follow, Post, User
+
+FOLLOWER_NAME = 'follower'
+AUTHOR_NAME = 'author'
+POST_TEXT = 'Тестовый пост ленты'
+
+
+class FollowFeedTests(TestCase):
+    def setUp(self):
+        self.follower = User.objects.create(username=FOLLOWER_NAME)
+        self.author = User.objects.create(username=AUTHOR_NAME)
+        self.old_post = Post.objects.create(author=self.author,
+                                            text=POST_TEXT)
+        self.client_follower = Client()
+        self.client_follower.force_login(self.follower)
+
+    def feed(self):
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Подписка дозаполняет ленту, новый пост раскладывается в неё."""
+        self.client_follower.get(reverse(
+            'posts:profile_follow', kwargs={'username': AUTHOR_NAME}))
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(), 2)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.client_follower.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': AUTHOR_NAME}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed(), [])
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 1)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @mock.patch('posts.timeline.FEED_FANOUT_LIMIT', 2)
+    def test_author_below_limit_is_pushed(self):
+        """Автор ниже порога: посты времён популярности попадают в ленту."""
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает ленты с нуля."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=mock.MagicMock())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @mock.patch('posts.timeline.FEED_DEPTH', 1)
+    def test_backfill_takes_recent_posts(self):
+        """Подписка дозаполняет ленту только последними постами автора."""
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.feed(), [new_post])
+
+    def test_feed_cursor_pages(self):
+        """Курсор ленты по FeedEntry проходит все посты без повторов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=POST_TEXT)
+                 for _ in range(POSTS_PER_PAGE)]
+        # Одна дата у всех: порядок решает id поста
+        Post.objects.update(pub_date=self.old_post.pub_date)
+        FeedEntry.objects.update(pub_date=self.old_post.pub_date)
+        expected = sorted(posts + [self.old_post], key=lambda post: -post.pk)
+        url = reverse('posts:follow_index')
+        first = self.client_follower.get(url).context['page_obj']
+        second = self.client_follower.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first) + list(second), expected)
@@ -5,11 +5,14 @@ from django import forms
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.constants import POSTS_PER_PAGE
-from posts.models import Follow, Group, Post, User
+from posts.constants import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.utils import bump_immediately
 
 USER_NAME = 'auth'
 USER_NAME_2 = 'HasNoName'
@@ -258,6 +261,138 @@ class PaginatorTests(TestCase):
                 self.assertEqual(len(response.context['page_obj']), 1)
 
 
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Тест keyset-пагинации."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USER_NAME)
+        for i in range(POSTS_PER_PAGE + 1):
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсор ведёт на следующую страницу и обратно без пропусков."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url + '?cursor=').context['page_obj']
+        self.assertEqual(len(first), POSTS_PER_PAGE)
+        self.assertFalse(first.has_previous())
+        second = self.guest_client.get(
+            url + f'?cursor={first.next_cursor}').context['page_obj']
+        self.assertEqual(len(second), 1)
+        self.assertFalse(second.has_next())
+        back = self.guest_client.get(
+            url + f'?cursor={second.previous_cursor}').context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_page_mode_links_to_cursor(self):
+        """Старая страница ?page=1 отдаёт курсор следующей страницы."""
+        page_obj = self.guest_client.get(
+            reverse('posts:index') + '?page=1').context['page_obj']
+        self.assertEqual(page_obj.number, 1)
+        self.assertIsNotNone(page_obj.next_cursor)
+
+    def test_page_to_cursor_with_equal_dates(self):
+        """Посты с одной датой на стыке ?page и курсора не теряются."""
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        url = reverse('posts:index')
+        first = self.guest_client.get(url + '?page=1').context['page_obj']
+        second = self.guest_client.get(
+            url + f'?cursor={first.next_cursor}').context['page_obj']
+        self.assertEqual(len({post.pk for post in list(first) + list(second)}),
+                         POSTS_PER_PAGE + 1)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        page_obj = self.guest_client.get(
+            reverse('posts:index') + '?cursor=broken').context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_PER_PAGE)
+
+
+class ListQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Тест числа запросов в лентах."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USER_NAME)
+        cls.group = Group.objects.create(
+            title=GROUP_NAME,
+            slug=GROUP_SLUG,
+        )
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': USER_NAME}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username=USER_NAME_2)
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_posts(self):
+        """Число запросов не зависит от количества постов на странице."""
+        Post.objects.create(author=self.user, group=self.group,
+                            text=POST_TEXT)
+        before = {url: self.count_queries(url) for url in self.pages}
+        for i in range(POSTS_PER_PAGE - 1):
+            Post.objects.create(author=self.user, group=self.group,
+                                text=f'{POST_TEXT} {i}')
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
+
+
+class CommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Тест порционной подгрузки комментариев."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USER_NAME)
+        cls.post = Post.objects.create(author=cls.user, text=POST_TEXT)
+        for i in range(COMMENTS_PER_PAGE + 1):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'{COMMENT_TEXT} {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_does_not_load_comments(self):
+        """Страница поста не ходит за комментариями."""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                reverse('posts:post_detail',
+                        kwargs={'post_id': self.post.pk}))
+        self.assertFalse(
+            [q for q in queries if 'posts_comment' in q['sql']])
+
+    def test_comments_come_in_batches(self):
+        """Комментарии отдаются порциями по курсору, авторы одним JOIN."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            first = self.guest_client.get(url).context['comments']
+        self.assertEqual(len(first), COMMENTS_PER_PAGE)
+        self.assertEqual(
+            len([q for q in queries if 'posts_comment' in q['sql']]), 1)
+        second = self.guest_client.get(
+            url + f'?cursor={first.next_cursor}').context['comments']
+        self.assertEqual(len(second), 1)
+        self.assertFalse(second.has_next())
+
+
 class FollowTests(TestCase):
     def setUp(self):
         cache.clear()
@@ -300,6 +435,7 @@ class FollowTests(TestCase):
         self.assertEqual('Тестовая запись подписчика', post_text_0)
 
 
+@bump_immediately
 class CacheTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -316,12 +452,46 @@ class CacheTests(TestCase):
 
     def test_cache_index(self):
         """Тест кэширования страницы index.html"""
+        cache.clear()
         first_state = self.authorized_client.get(reverse('posts:index'))
-        post_1 = Post.objects.get(pk=1)
+        with CaptureQueriesContext(connection) as queries:
+            second_state = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(first_state.content, second_state.content)
+        self.assertFalse(
+            [q for q in queries if 'posts_post' in q['sql']],
+            'Посты второй раз должны браться из кэша')
+        post_1 = Post.objects.get(pk=self.post.pk)
         post_1.text = CACHE_INDEX_POST_TEXT
         post_1.save()
-        second_state = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(first_state.content, second_state.content)
-        cache.clear()
         third_state = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_state.content, third_state.content)
+        self.assertContains(third_state, CACHE_INDEX_POST_TEXT)
+
+    def test_cards_follow_author_and_group_renames(self):
+        """Новое имя автора и название группы сразу видны в лентах."""
+        cache.clear()
+        group = Group.objects.create(title='Старая группа', slug='renamed')
+        Post.objects.create(author=self.user, group=group, text='Пост')
+        pages = (reverse('posts:index'),
+                 reverse('posts:group_posts', kwargs={'slug': 'renamed'}))
+        for page in pages:
+            self.guest_client.get(page)
+        self.user.username = 'renamed_author'
+        self.user.save()
+        group.title = 'Новая группа'
+        group.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(response, 'renamed_author')
+                self.assertContains(response, 'Новая группа')
+
+    def test_cache_key_depends_on_page(self):
+        """Вторая страница не отдаётся из кэша первой."""
+        cache.clear()
+        for i in range(POSTS_PER_PAGE):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, CACHE_POST_TEXT)
@@ -0,0 +1,7 @@
+from unittest import mock
+
+# TestCase не коммитит транзакцию, и колбэки on_commit не срабатывают:
+# версии областей страниц поднимаем сразу, как после коммита
+bump_immediately = mock.patch(
+    'posts.page_cache.transaction',
+    mock.Mock(on_commit=lambda func: func()))
@@ -0,0 +1,59 @@
+"""Генерация миниатюр в фоне, вне цикла запроса.
+
+После сохранения поста с картинкой задача уходит в пул потоков, а
+готовый URL записывается в Post.thumbnail_url. Шаблоны выводят только
+этот URL и не обращаются ни к Pillow, ни к KV-хранилищу sorl.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core.metrics import registry
+
+from .constants import (THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS,
+                        THUMBNAIL_WORKERS)
+from .models import Post
+from .page_cache import bump_versions, post_scopes
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS,
+                               thread_name_prefix='thumbnails')
+
+
+def generate(post_id):
+    """Режет миниатюру поста и сохраняет её URL."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'group', 'image').first()
+    if post is None or not post.image:
+        return None
+    url = get_thumbnail(post.image, THUMBNAIL_GEOMETRY,
+                        **THUMBNAIL_OPTIONS).url
+    # update() не шлёт сигналы: версии лент поднимаем сами
+    Post.objects.filter(pk=post_id).update(thumbnail_url=url)
+    bump_versions(*post_scopes(post))
+    return url
+
+
+def _run(post_id):
+    close_old_connections()
+    started = time.perf_counter()
+    try:
+        generate(post_id)
+    except Exception:
+        registry.inc('yatube_thumbnail_failures_total')
+        logger.exception('Не удалось сделать миниатюру поста %s', post_id)
+    else:
+        registry.observe('yatube_thumbnail_seconds',
+                         time.perf_counter() - started)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """Ставит миниатюру в очередь после коммита транзакции."""
+    if post.image:
+        transaction.on_commit(lambda: _executor.submit(_run, post.pk))
@@ -0,0 +1,139 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается в FeedEntry всем подписчикам автора, поэтому
+страница подписок читает один диапазон индекса (user, pub_date, post).
+Посты популярных авторов (FEED_FANOUT_LIMIT подписчиков и больше)
+не раскладываются, а подтягиваются при чтении. Популярность везде
+берётся из AuthorStats.followers_count; когда автор опускается ниже
+порога, его посты раскладываются подписчикам задним числом.
+
+Задним числом (подписка, возврат автора ниже порога, пересборка)
+в ленту попадают только последние FEED_DEPTH постов автора: так
+объём записи ограничен и у плодовитых авторов.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F, Q
+
+from .constants import FEED_BATCH_SIZE, FEED_DEPTH, FEED_FANOUT_LIMIT
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+# Ключ сортировки и курсора ленты: поля аннотаций follow_feed
+FEED_ORDER = ('feed_date', 'feed_post_id')
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _followers_count(author_id):
+    return AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+
+
+def is_popular(author_id):
+    """Автор с большим числом подписчиков раздаётся при чтении."""
+    return (_followers_count(author_id) or 0) >= FEED_FANOUT_LIMIT
+
+
+def pull_author_ids(user):
+    """id популярных авторов, на которых подписан user."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gte=FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk,
+                  author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def _author_entries(user_ids, author_id):
+    # Последние посты автора читаются один раз на всех читателей
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values_list('pk', 'pub_date')[:FEED_DEPTH])
+    for user_id in user_ids:
+        for post_id, pub_date in posts:
+            yield FeedEntry(user_id=user_id, post_id=post_id,
+                            author_id=author_id, pub_date=pub_date)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if not is_popular(author_id):
+        _bulk_insert(_author_entries([user_id], author_id))
+
+
+def push_author(author_id):
+    """Раскладывает последние посты автора по лентам его подписчиков."""
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    _bulk_insert(_author_entries(follower_ids.iterator(), author_id))
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя.
+
+    Если автор этой отпиской опустился ниже порога, посты, написанные
+    им в популярности, раскладываются оставшимся подписчикам.
+    """
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    if _followers_count(author_id) == FEED_FANOUT_LIMIT - 1:
+        push_author(author_id)
+
+
+def follow_feed(user):
+    """Посты ленты подписок user с ключом сортировки FEED_ORDER.
+
+    Без популярных авторов ключ - поля FeedEntry: сортировку и курсор
+    покрывает индекс feed_user_date_idx, временного B-дерева нет.
+    """
+    pull_ids = pull_author_ids(user)
+    if not pull_ids:
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post_id=F('feed_entries__post_id'))
+    pushed = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=pushed) | Q(author_id__in=pull_ids)).annotate(
+        feed_date=F('pub_date'), feed_post_id=F('pk'))
+
+
+def rebuild_feeds():
+    """Пересобирает все ленты с нуля, возвращает число записей.
+
+    Записи коммитятся пачками по FEED_BATCH_SIZE, а не одной
+    транзакцией: пересборка не держит блокировку записи всё время.
+    """
+    FeedEntry.objects.all().delete()
+    popular = set(AuthorStats.objects.filter(
+        followers_count__gte=FEED_FANOUT_LIMIT).values_list(
+        'user_id', flat=True))
+    follows = Follow.objects.exclude(author_id__in=popular).order_by(
+        'author_id').values_list('author_id', 'user_id')
+    _bulk_insert(
+        entry
+        for author_id, rows in groupby(follows.iterator(), itemgetter(0))
+        for entry in _author_entries(
+            (user_id for _, user_id in rows), author_id)
+    )
+    return FeedEntry.objects.count()
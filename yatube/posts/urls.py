@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -25,6 +25,46 @@ urlpatterns = [
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'rss/',
+        feeds.index_rss,
+        name='index_rss'
+    ),
+    path(
+        'atom/',
+        feeds.index_atom,
+        name='index_atom'
+    ),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.group_rss,
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.group_atom,
+        name='group_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.profile_rss,
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.profile_atom,
+        name='profile_atom'
+    ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
+    path(
+        'export/',
+        views.export,
+        name='export'
+    ),
     path(
         'create/',
         views.post_create,
@@ -35,6 +75,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -55,4 +100,34 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'api/posts/',
+        api.posts,
+        name='api_posts'
+    ),
+    path(
+        'api/group/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/profile/<str:username>/posts/',
+        api.profile_posts,
+        name='api_profile_posts'
+    ),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comments,
+        name='api_comments'
+    ),
+    path(
+        'api/follow/',
+        api.follow,
+        name='api_follow'
+    ),
 ]
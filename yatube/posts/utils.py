@@ -1,10 +1,144 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
-from .constants import POSTS_PER_PAGE
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
+from .constants import COMMENTS_PER_PAGE, CURSOR_PARAM, POSTS_PER_PAGE
+from .models import Comment
 
-def get_paginator(request, QuerySet):
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_cursor(obj, direction=CURSOR_NEXT, date_field='pub_date',
+                  pk_field='pk'):
+    """Кодирует позицию объекта (дата, id) в строку для URL.
+
+    obj - модель или строка values() с полями date_field и id.
+    """
+    if isinstance(obj, dict):
+        date = obj[date_field]
+        pk = obj['id' if pk_field == 'pk' else pk_field]
+    else:
+        date, pk = getattr(obj, date_field), getattr(obj, pk_field)
+    value = f'{direction}|{date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для битого курсора возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, date, pk = value.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or date is None:
+        return None
+    return direction, date, pk
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: без номера и без общего числа записей."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self[-1], CURSOR_NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self[0], CURSOR_PREVIOUS)
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (date_field, pk_field) от новых записей к старым.
+
+    Стоимость запроса не зависит от глубины страницы: вместо
+    COUNT(*) и OFFSET используется диапазон по индексу.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 pk_field='pk'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.pk_field = pk_field
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor(obj, direction, self.date_field, self.pk_field)
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        field, pk_field = self.date_field, self.pk_field
+        if position is None:
+            queryset = self.object_list.order_by(f'-{field}', f'-{pk_field}')
+            rows = list(queryset[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page], self, has_more, False)
+        direction, date, pk = position
+        if direction == CURSOR_NEXT:
+            queryset = self.object_list.filter(
+                Q(**{f'{field}__lt': date})
+                | Q(**{field: date, f'{pk_field}__lt': pk})
+            ).order_by(f'-{field}', f'-{pk_field}')
+        else:
+            queryset = self.object_list.filter(
+                Q(**{f'{field}__gt': date})
+                | Q(**{field: date, f'{pk_field}__gt': pk})
+            ).order_by(field, pk_field)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == CURSOR_NEXT:
+            return CursorPage(rows, self, has_more, True)
+        rows.reverse()
+        return CursorPage(rows, self, True, has_more)
+
+
+def get_comments_page(request, post_id):
+    """Порция комментариев поста по курсору, авторы одним JOIN."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE, 'created')
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+
+def get_paginator(request, QuerySet, date_field='pub_date', pk_field='pk'):
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor is not None:
+        # Keyset-режим: глубина страницы не влияет на стоимость запроса
+        return CursorPaginator(
+            QuerySet, POSTS_PER_PAGE, date_field, pk_field).get_page(cursor)
+    # Порядок как у курсора: иначе посты с одной датой на стыке
+    # страницы и курсора пропадут или повторятся
+    QuerySet = QuerySet.order_by(f'-{date_field}', f'-{pk_field}')
     paginator = Paginator(QuerySet, POSTS_PER_PAGE)  # Показывать по 10  .
     page_number = request.GET.get('page')  # Из URL извл. № стр-знач пар-а
     page_obj = paginator.get_page(page_number)  # набор записей
+    if page_obj.has_next():
+        # Со второй страницы переходим на курсор, старые ?page=N работают
+        page_obj.next_cursor = encode_cursor(
+            page_obj[-1], date_field=date_field, pk_field=pk_field)
     return page_obj
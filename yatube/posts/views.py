@@ -1,66 +1,134 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+
+from core.writes import write
 
 from .models import Follow, Group, Post, User
+from .conditional import (comments_scopes, conditional, follow_index_scopes,
+                          group_scopes, index_scopes, post_detail_scopes,
+                          profile_scopes)
+from .constants import CURSOR_PARAM, PAGE_CACHE_TIMEOUT
+from .exporter import CONTENT_TYPES, FIELDS, export_lines
 from .forms import CommentForm, PostForm
-from .utils import get_paginator
+from .page_cache import INDEX_SCOPE, author_scope, cached_page, group_scope
+from .search import search_posts
+from .stats import get_stats
+from .thumbnails import schedule as schedule_thumbnail
+from .timeline import FEED_ORDER, follow_feed
+from .utils import get_comments_page, get_paginator
 
 
-@cache_page(20)
+@conditional(index_scopes)
 def index(request):
     title = 'Главная страница'
-    page_obj = get_paginator(request, Post.objects.all())
+    page_obj, page_key = cached_page(
+        request, Post.objects.cards(), INDEX_SCOPE)
     context = dict(
+        cache_timeout=PAGE_CACHE_TIMEOUT,
+        page_key=page_key,
         page_obj=page_obj,
         title=title
     )
     return render(request, 'posts/index.html', context)
 
 
+@conditional(group_scopes)
 def group_posts(request, slug):
     title = 'Посты группы'
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_paginator(request, group.posts.all())
+    page_obj, page_key = cached_page(
+        request, group.posts.cards(), group_scope(group.pk))
     context = dict(
+        cache_timeout=PAGE_CACHE_TIMEOUT,
         group=group,
+        page_key=page_key,
         page_obj=page_obj,
         title=title
     )
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional(profile_scopes)
 def profile(request, username):
     title = 'Профиль'
-    author = get_object_or_404(User, username=username)
-    page_obj = get_paginator(request, author.posts.all())
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    page_obj, page_key = cached_page(
+        request, author.posts.cards(), author_scope(author.pk))
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
                                           author=author).exists()
     context = dict(
         author=author,
+        cache_timeout=PAGE_CACHE_TIMEOUT,
         following=following,
+        page_key=page_key,
         page_obj=page_obj,
+        stats=get_stats(author),
         title=title
     )
     return render(request, 'posts/profile.html', context)
 
 
+@conditional(post_detail_scopes)
 def post_detail(request, post_id):
     title = 'Информация о посте'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     form = CommentForm()
     context = dict(
         post=post,
+        author_stats=get_stats(post.author),
         title=title,
-        comments=post.comments.all(),
         form=form
     )
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional(comments_scopes)
+def comments(request, post_id):
+    """HTML-порция комментариев: страница поста подгружает их после себя."""
+    context = dict(
+        comments=get_comments_page(request, post_id),
+        post_id=post_id
+    )
+    return render(request, 'includes/comments_page.html', context)
+
+
+def search(request):
+    title = 'Поиск'
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search_posts(query, request.GET.get(CURSOR_PARAM))
+    context = dict(
+        next_cursor=next_cursor,
+        posts=posts,
+        query=query,
+        title=title
+    )
+    return render(request, 'posts/search.html', context)
+
+
+@login_required
+def export(request):
+    """Выгрузка своих постов и комментариев к ним потоком."""
+    export_format = request.GET.get('format')
+    if export_format not in CONTENT_TYPES:
+        export_format = 'jsonl'
+    row_type = request.GET.get('type')
+    if row_type not in FIELDS:
+        row_type = None
+    response = StreamingHttpResponse(
+        export_lines(export_format, author=request.user, row_type=row_type),
+        content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.{export_format}"')
+    return response
+
+
 @login_required()
 def post_create(request):
     title = 'Создание нового поста'
@@ -76,7 +144,8 @@ def post_create(request):
         return render(request, 'posts/create_post.html', context)
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    write(post.save)
+    schedule_thumbnail(post)
     messages.success(request, 'Пост успешно создан!')
     return redirect('posts:profile', request.user)
 
@@ -92,7 +161,11 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
+        if 'image' in form.changed_data:
+            post.thumbnail_url = ''
         form.save()
+        if not post.thumbnail_url:
+            schedule_thumbnail(post)
         return redirect('posts:post_detail', post_id)
     context = dict(
         form=form,
@@ -114,14 +187,15 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional(follow_index_scopes)
 def follow_index(request):
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_paginator(request, posts_list)
+    posts_list = follow_feed(request.user).cards()
+    page_obj = get_paginator(request, posts_list, *FEED_ORDER)
     context = dict(
         page_obj=page_obj)
     return render(request, 'posts/follow.html', context)
@@ -132,11 +206,12 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        write(Follow.objects.get_or_create, user=user, author=author)
     return redirect("posts:profile", username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     user = request.user
     Follow.objects.filter(user=user, author__username=username).delete()
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -49,25 +53,77 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.timing.RequestTimingMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.anonymous.CookielessReadMiddleware',
+    'core.replica.ReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware'
+    'core.profiling.ProfilingMiddleware',
 ]
+
+# Замеры запросов в Server-Timing и JSON-строку на запрос в лог
+# core.timing. В бою включается окружением; цену замеров показывает
+# manage.py loadtest --timing-overhead
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING') == '1'
+
+# Метрики Prometheus на /metrics/, общие для воркеров через файл SQLite
+METRICS = True
+METRICS_PATH = os.path.join(BASE_DIR, 'metrics.sqlite3')
+# Как часто процесс сливает накопленные метрики в файл, сек.
+METRICS_FLUSH_INTERVAL = 5
+# Без REQUEST_TIMING SQL, шаблоны и кэш замеряются у каждого N-го
+# запроса: обёртка execute на каждом запросе стоит заметных процентов
+METRICS_SAMPLE_EVERY = 10
+
+# Комментарии, подписки и посты пишутся через один поток с групповым
+# коммитом (core.writes); пачка - до WRITE_BATCH_SIZE заданий, ожидание
+# попутчиков - до WRITE_BATCH_WAIT сек.
+WRITE_QUEUE = True
+WRITE_BATCH_SIZE = 50
+WRITE_BATCH_WAIT = 0.002
+# Сколько секунд запрос ждёт коммита своей записи
+WRITE_TIMEOUT = 30
+
+# Журнал медленных SQL с EXPLAIN; сводка - manage.py slow_queries
+SLOW_QUERY_LOG = False
+SLOW_QUERY_THRESHOLD_MS = 100
+# Доля запросов, SQL которых проверяется на медленность
+SLOW_QUERY_SAMPLE_RATE = 0.1
+SLOW_QUERY_LOG_PATH = os.path.join(BASE_DIR, 'slow_queries.log')
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# cProfile для доли запросов или по заголовку X-Profile: <токен>;
+# дампы сводит manage.py merge_profiles
+PROFILING = False
+PROFILING_SAMPLE_RATE = 0.001
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# debug_toolbar дорогой и только для разработки: включается отдельно
+DEBUG_TOOLBAR = DEBUG
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 # Добавьте IP адреса, при обращении с которых будет доступен DjDT
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Адреса, с которых отдаются /metrics/
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
 ROOT_URLCONF = 'yatube.urls'
 
 LOGIN_URL = 'users:login'
@@ -109,7 +165,68 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение переживает запрос, а не открывается заново
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Сколько ждать блокировку записи, сек.
+            'timeout': 5,
+        },
+    },
+    # Копия default для лент, обновляется командой sync_replica
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 5,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['core.replica.ReplicaRouter']
+
+# Только чтение: эти страницы можно отдавать с реплики (см. core.replica)
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:comments',
+    'posts:index_rss',
+    'posts:index_atom',
+    'posts:group_rss',
+    'posts:group_atom',
+    'posts:profile_rss',
+    'posts:profile_atom',
+]
+
+# Анонимные GET к этим страницам - без сессии и кук, с разрешением
+# общему кэшу хранить ответ (см. core.anonymous). Прокси должен ходить
+# мимо кэша для запросов с кукой сессии
+COOKIELESS_ANONYMOUS = True
+COOKIELESS_VIEWS = REPLICA_VIEWS + ['posts:search']
+COOKIELESS_PROXY_MAX_AGE = 10
+
+# Сколько секунд после своей записи пользователь читает основную БД
+REPLICA_PIN_SECONDS = 10
+
+# Период копирования в реплику для sync_replica --loop, сек.
+REPLICA_SYNC_INTERVAL = 2
+
+# Ставятся на каждое новое соединение SQLite (core.db); сравнение
+# до и после - manage.py bench_sqlite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # С WAL NORMAL не теряет целостность при сбое, fsync реже
+    'synchronous': 'NORMAL',
+    # Отрицательное значение - в КиБ: 64 МиБ страничного кэша
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -155,8 +272,61 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
 
+# Один файл кэша на хост: его делят все воркеры WSGI
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_PATH,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': SLOW_QUERY_LOG_BACKUPS,
+            'formatter': 'message',
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Тесты (manage.py test и pytest) чистят кэш и пишут метрики: даём им
+# временные файлы, чтобы не трогать кэш и метрики рабочей копии
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+if TESTING:
+    TEST_FILES_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, TEST_FILES_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(TEST_FILES_DIR,
+                                                 'cache.sqlite3')
+    METRICS_PATH = os.path.join(TEST_FILES_DIR, 'metrics.sqlite3')
@@ -18,6 +18,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics
+
 urlpatterns = [
     path(
         '',
@@ -39,6 +41,11 @@ urlpatterns = [
         'about/',
         include('about.urls', namespace='about')
     ),
+    path(
+        'metrics/',
+        metrics,
+        name='metrics'
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -49,6 +56,8 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if settings.DEBUG_TOOLBAR:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)